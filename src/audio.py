@@ -1,32 +1,207 @@
-import pygame, os
+import pygame, io, math, os
+from collections import OrderedDict
+import startup, constants, log
+
+numpy = startup.lazy("numpy")
+sndarray = startup.lazy("pygame.sndarray")
+
+buffer_size = None # mixer buffer (samples) requested by pre_init
+
+def pre_init(preset: str):
+	# mixer parameters only apply when the mixer opens, so this has to run before pygame.init()
+	# returns the preset actually used (unknown names fall back to the default)
+	preset = str(preset).capitalize()
+	if preset not in constants.AUDIO_LATENCY_PRESETS:
+		preset = constants.AUDIO_LATENCY
+	frequency, buffer, channels = constants.AUDIO_LATENCY_PRESETS[preset]
+	global buffer_size
+	buffer_size = buffer
+	pygame.mixer.pre_init(frequency, -16, channels, buffer)
+	return preset
+
+class MusicCache:
+	"""
+	Keeps the encoded bytes of recently played tracks in memory, evicting the least recently
+	played once over budget, so going back to a track never waits on the disk.
+	"""
+	def __init__(self, budget: int = constants.MUSIC_CACHE_BYTES):
+		self.budget = budget
+		self.entries = OrderedDict() # path -> bytes, least recently used first
+		self.size = 0
+
+	def get(self, path: str) -> bytes:
+		data = self.entries.get(path)
+		if data is not None:
+			self.entries.move_to_end(path)
+			return data
+		with open(path, "rb") as f:
+			data = f.read()
+		if len(data) <= self.budget:
+			self.entries[path] = data
+			self.size += len(data)
+			while self.size > self.budget:
+				_, old = self.entries.popitem(last=False)
+				self.size -= len(old)
+		return data
+
+	def clear(self):
+		self.entries.clear()
+		self.size = 0
+
+class VoiceManager:
+	"""
+	Plays sound effects on channels reserved per category (constants.SFX_VOICES). When all
+	of a category's voices are busy the new sound takes the voice playing the lowest priority
+	sound (oldest first), or is dropped if everything playing outranks it.
+	"""
+	def __init__(self, voices: dict = constants.SFX_VOICES):
+		reserved = sum(voices.values())
+		pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved + constants.SFX_FREE_CHANNELS))
+		pygame.mixer.set_reserved(reserved)
+		self.channels = {} # category -> [Channel]
+		first = 0
+		for category, count in voices.items():
+			self.channels[category] = [pygame.mixer.Channel(i) for i in range(first, first + count)]
+			first += count
+		self.playing = {} # channel id -> (priority, start ticks)
+		self.dropped = 0
+
+	def play(self, sound, category: str, priority: int = 0, volume: float = 1.0):
+		channels = self.channels.get(category) or self.channels["ui"]
+		channel = self._voice(channels, priority)
+		if channel is None:
+			self.dropped += 1
+			return None
+		channel.set_volume(volume)
+		channel.play(sound)
+		self.playing[id(channel)] = (priority, pygame.time.get_ticks())
+		return channel
+
+	def _voice(self, channels, priority):
+		steal = None
+		for channel in channels:
+			if not channel.get_busy():
+				return channel
+			playing = self.playing.get(id(channel), (0, 0))
+			if playing[0] <= priority and (steal is None or playing < self.playing.get(id(steal), (0, 0))):
+				steal = channel
+		return steal
+
+	def stop(self, category: str = None):
+		for name, channels in self.channels.items():
+			if category is None or name == category:
+				for channel in channels:
+					channel.stop()
+
+class Metronome:
+	"""
+	A click track on the metronome channel. A few beats of clicks are mixed into one buffer at
+	exact sample positions and looped, so the clicks stay on the beat grid whatever the frame
+	rate. start() rotates the buffer so playback begins at the current point in the grid.
+	"""
+	BEATS = 8 # beats per buffer; rounding each buffer to whole samples drifts < 1 sample per loop
+
+	def __init__(self, channel, click = None):
+		self.channel = channel
+		self.click = click # callable returning the click Sound (or None for a synthesised click)
+		self.bpm = None # tempo of the running click track, None when stopped
+		self._blocks = {} # bpm -> unrotated int16 buffer
+
+	def start(self, bpm: float, phase: float, volume: float = 1.0):
+		# phase: seconds since beat 0 of the grid (negative before it); the next click lands on the grid
+		block = self._block(bpm)
+		freq = pygame.mixer.get_init()[0]
+		offset = int(round(phase * freq)) % len(block)
+		sound = sndarray.make_sound(numpy.ascontiguousarray(numpy.roll(block, -offset, axis=0)))
+		self.channel.set_volume(volume)
+		self.channel.play(sound, loops=-1)
+		self.bpm = bpm
+
+	def stop(self):
+		if self.bpm is not None:
+			self.channel.stop()
+			self.bpm = None
+
+	def _block(self, bpm):
+		block = self._blocks.get(bpm)
+		if block is not None:
+			return block
+		freq, _, channels = pygame.mixer.get_init()
+		interval = 60.0 / bpm * freq
+		length = int(round(self.BEATS * interval))
+		click = self._click_samples(freq, channels)
+		mix = numpy.zeros((length, channels) if channels > 1 else length, dtype=numpy.float32)
+		for k in range(self.BEATS):
+			# wrap the tail around, so a click longer than a beat still overlaps the next ones
+			at = (int(round(k * interval)) + numpy.arange(len(click))) % length
+			numpy.add.at(mix, at, click)
+		block = numpy.clip(mix, -32768, 32767).astype(numpy.int16)
+		self._blocks[bpm] = block
+		return block
+
+	def _click_samples(self, freq, channels):
+		sound = self.click() if self.click else None
+		if sound is not None:
+			return sndarray.array(sound).astype(numpy.float32)
+		# short decaying 1.5 kHz blip
+		t = numpy.arange(int(freq * 0.03)) / freq
+		wave = numpy.sin(2 * math.pi * 1500 * t) * numpy.exp(-t / 0.006) * 0.5 * 32767
+		return numpy.repeat(wave[:, None], channels, axis=1).astype(numpy.float32) if channels > 1 else wave.astype(numpy.float32)
 
 class AudioManager:
 	def __init__(self):
 		pygame.mixer.init()
+		self.voices = VoiceManager()
 		self.sfx = {}
+		self.metronome = Metronome(self.voices.channels["metronome"][0], lambda: self.sfx.get("ui_1"))
 		self.music_loaded = False
+		self.music_path = None # what the mixer's music stream currently holds
+		self.music_cache = MusicCache()
+		self._music_file = None # the stream reads from this while it plays
 	
-	def load_sfx(self, name: str, path: str):
+	def load_sfx(self, name: str, path: str, packed = None):
+		# packed: an asset pack holding the sound as raw PCM in the mixer's format
+		if packed is not None:
+			raw = packed.sfx(name)
+			if raw is not None:
+				self.sfx[name] = pygame.mixer.Sound(buffer=raw)
+				return
 		if os.path.exists(path):
 			self.sfx[name] = pygame.mixer.Sound(path)
 
-	def play_sfx(self, name: str, volume: float = 1.0):
+	def play_sfx(self, name: str, volume: float = 1.0, category: str = None):
+		# category defaults to the sound's own (constants.SFX_CATEGORY); returns the channel, if any
 		s = self.sfx.get(name)
 		if s:
-			s.set_volume(volume)
-			s.play()
+			category = category or constants.SFX_CATEGORY.get(name, "ui")
+			return self.voices.play(s, category, constants.SFX_PRIORITY.get(name, 0), volume)
+		return None
 	
 	def load_music(self, path: str):
+		# the track already in the mixer is kept (play_music restarts it); others load from memory
+		if self.music_loaded and path == self.music_path:
+			return
 		try:
-			pygame.mixer.music.load(path)
+			self._music_file = io.BytesIO(self.music_cache.get(path))
+			pygame.mixer.music.load(self._music_file, os.path.splitext(path)[1].lstrip("."))
 			self.music_loaded = True
+			self.music_path = path
 		except Exception as e:
-			print("Music load error:", e)
+			log.warning("Music load error: %s", e)
 			self.music_loaded = False
+			self.music_path = None
+			self._music_file = None
 	
 	def play_music(self, loop: int = -1):
 		if self.music_loaded:
 			pygame.mixer.music.play(loop)
 	
+	def output_latency_ms(self):
+		# estimate: SDL keeps about two buffers queued ahead of the one the device is playing
+		init = pygame.mixer.get_init()
+		if not init or not buffer_size:
+			return None
+		return 2 * buffer_size / init[0] * 1000
+
 	def stop_music(self):
 		pygame.mixer.music.stop()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Beatmap charts
+"""
+
+# a chart sits next to its track (music/<track>.chart) and lists one obstacle per line:
+#
+#   <beat> [sprite] [height]   # comment
+#
+# beat counts from the start of the song (0 = the first beat) and may be subdivided: 16, 16.5
+# or 16+1/3. sprite is an index into the theme's obstacle frames (wrapping round) or * for a
+# random one, and height is one of constants.OBSTACLE_LIFTS. they default to * and ground.
+
+import array, math, os
+from fractions import Fraction
+import constants, log
+
+RANDOM_SPRITE = -1
+MAX_BEAT = 100000 # a few hours into even the fastest song; anything later is a typo
+
+_charts = {} # (path, bpm) -> Chart or None (no chart), compiled once per process
+
+class Chart:
+	"""
+	A compiled chart: parallel arrays of arrival times (seconds from the song start, sorted),
+	sprite indices and lifts (native px above the ground), so a whole song is a few KB and
+	the scheduler reads it by index.
+	"""
+	def __init__(self, times: array.array, sprites: array.array, lifts: array.array):
+		self.times = times
+		self.sprites = sprites
+		self.lifts = lifts
+
+	def __len__(self):
+		return len(self.times)
+
+def parse_beat(text: str) -> Fraction:
+	whole, _, sub = text.partition("+")
+	beat = Fraction(whole)
+	if sub:
+		beat += Fraction(sub)
+	if beat < 0:
+		raise ValueError("beat before the song starts")
+	if beat > MAX_BEAT:
+		raise ValueError(f"beat after {MAX_BEAT}")
+	return beat
+
+def compile_chart(lines, bpm: float, source: str = "<chart>") -> Chart:
+	# bad lines are logged and skipped, so one typo doesn't lose the whole chart
+	events = []
+	for number, line in enumerate(lines, 1):
+		fields = line.split("#", 1)[0].split()
+		if not fields:
+			continue
+		try:
+			time = float(parse_beat(fields[0])) * 60.0 / bpm
+			if not math.isfinite(time):
+				raise ValueError("beat time isn't a number")
+			sprite = fields[1] if len(fields) > 1 else "*"
+			sprite = RANDOM_SPRITE if sprite == "*" else int(sprite)
+			if not 0 <= sprite <= 127 and sprite != RANDOM_SPRITE:
+				raise ValueError(f"sprite {sprite} out of range")
+			height = fields[2] if len(fields) > 2 else "ground"
+			if height not in constants.OBSTACLE_LIFTS:
+				raise ValueError(f"height should be one of {', '.join(constants.OBSTACLE_LIFTS)}")
+		except (ValueError, ZeroDivisionError, OverflowError) as e:
+			log.warning("Chart %s line %d: skipping %r (%s)", source, number, line.strip(), e)
+			continue
+		events.append((time, sprite, constants.OBSTACLE_LIFTS[height]))
+
+	events.sort(key=lambda e: e[0])
+	return Chart(
+		array.array("d", (e[0] for e in events)),
+		array.array("b", (e[1] for e in events)),
+		array.array("h", (e[2] for e in events)),
+	)
+
+def load(track_path: str, bpm: float):
+	# the compiled chart for a track, or None if it hasn't got one (random spacing is used instead)
+	path = track_path + ".chart"
+	key = (path, bpm)
+	if key not in _charts:
+		chart = None
+		if os.path.isfile(path):
+			try:
+				with open(path, encoding="utf-8") as f:
+					chart = compile_chart(f, bpm, path)
+				log.debug("Chart %s: %d obstacles", path, len(chart))
+			except (OSError, UnicodeDecodeError) as e:
+				log.warning("Chart load error: %s", e)
+		_charts[key] = chart
+	return _charts[key]
+
+class ChartScheduler:
+	"""
+	Walks a chart during play. Obstacles have to be on screen before they arrive, so each is
+	handed out lead seconds early (the time it takes to scroll from the spawn edge to the
+	player) and placed where it reaches PLAYER_X() exactly on its beat. The next event is
+	always chart.times[index], so a frame with nothing due costs one comparison.
+	"""
+	def __init__(self, chart: Chart):
+		self.chart = chart
+		self.index = 0
+
+	def done(self) -> bool:
+		return self.index >= len(self.chart.times)
+
+	def pop_due(self, song_time: float, lead: float) -> int:
+		# index of the next event to spawn now, or -1; events the player has already passed are dropped
+		times = self.chart.times
+		while self.index < len(times) and times[self.index] - lead <= song_time:
+			i = self.index
+			self.index += 1
+			if times[i] >= song_time:
+				return i
+		return -1
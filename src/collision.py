@@ -0,0 +1,59 @@
+"""
+Collision detection
+"""
+
+import math
+from typing import NamedTuple
+
+SWEEP_STEP = 4 # most pixels the player and an obstacle move relative to each other between narrow-phase samples
+
+class Hit(NamedTuple):
+	obstacle: object
+	point: tuple # first overlapping pixel, in screen coordinates
+	time: float # when in the frame contact happened (0 = previous positions, 1 = current ones)
+
+def sweep(player, obstacles, step: int = SWEEP_STEP):
+	"""
+	First contact between the player and an obstacle during the last frame. Both are swept
+	from their previous to their current positions (player.prev_y, obstacle.prev_x), so a long
+	frame can't carry an obstacle through the player. The broad phase uses the boxes around
+	the opaque pixels of their precomputed frames (player.frame(), obstacle.frame); obstacles
+	must come in x order and move left (as models.ObstaclePool keeps them), and the scan stops
+	at the first one that starts right of the player. Returns a Hit or None.
+	"""
+	frame, (fx, fy) = player.frame()
+	box = frame.bbox
+	if not box.w:
+		return None
+	mask_x = int(player.x) + fx
+	left = mask_x + box.x
+	right = left + box.w
+	top = int(min(player.prev_y, player.y)) + fy + box.y
+	bottom = int(max(player.prev_y, player.y)) + fy + box.bottom
+
+	hit = None
+	for obs in obstacles:
+		# broad phase: the area each swept over this frame
+		if obs.x >= right:
+			break
+		obox = obs.frame.bbox
+		if not obox.w or obs.x + obox.x >= right or max(obs.x, obs.prev_x) + obox.right <= left:
+			continue
+		if obs.y + obox.y >= bottom or obs.y + obox.bottom <= top:
+			continue
+
+		# narrow phase: pixel masks at evenly spaced points along both paths
+		dx = obs.x - obs.prev_x
+		dy = player.y - player.prev_y
+		samples = max(1, math.ceil(max(abs(dx), abs(dy)) / step))
+		for i in range(1, samples + 1):
+			t = i / samples
+			if hit is not None and t >= hit.time:
+				break
+			mask_y = int(player.prev_y + dy * t) + fy
+			ox = int(obs.prev_x + dx * t)
+			point = frame.mask.overlap(obs.frame.mask, (ox - mask_x, int(obs.y) - mask_y))
+			if point:
+				hit = Hit(obs, (mask_x + point[0], mask_y + point[1]), t)
+				break
+	return hit
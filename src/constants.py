@@ -3,6 +3,7 @@ Configuration/constants
 """
 
 import os
+from typing import NamedTuple
 
 NAME = "Campfire Sandwich"
 
@@ -11,56 +12,126 @@ NAME = "Campfire Sandwich"
 window_width___internal = 1280
 window_height___internal = 720
 
-def WINDOW_WIDTH(): return window_width___internal
-def WINDOW_HEIGHT(): return window_height___internal
 FPS = 60
+RESIZE_SETTLE_MS = 120 # wait this long after the last resize event before relaying out
+STARTUP_BUDGET_MS = 400 # from the first import to the window opening; slower launches log a warning
 
 # Derived layout values (relative)
 
 GROUND_FRACTION = 0.82 # fraction of window height where ground top sits
 
-def GROUND_Y(): return int(WINDOW_HEIGHT() * GROUND_FRACTION)
-
 # Base sprite frame sizes (pixel-art native sizes)
 
 NATIVE_TILE = 16
+MIN_TILES = 3 # narrower tilesets are padded with blank tiles
 NATIVE_PLAYER = 24
 NATIVE_MASCOT = 24
 NATIVE_OBS = 24
 NATIVE_BEAT = 48
 
-# Sprite scale factor (integer) derived from window height to keep pixel-art crisp
-
-def SPRITE_SCALE(): return max(1, int(WINDOW_HEIGHT() / 240))
-
-# Scaled sizes used for rendering
-
-def TILE_SIZE(): return NATIVE_TILE * SPRITE_SCALE()
-def PLAYER_SIZE(): return NATIVE_PLAYER * SPRITE_SCALE() * 1.5
-def MASCOT_SIZE(): return NATIVE_MASCOT * SPRITE_SCALE()
-def OBS_SIZE(): return NATIVE_OBS * SPRITE_SCALE() * 1.5
-def HEARTBEAT_SIZE(): return NATIVE_BEAT * (SPRITE_SCALE() / 3)
-
-def PLAYER_X(): return int(WINDOW_WIDTH() * 0.12) # relative horizontal player position
-
-def GRAVITY(): return 2000.0 * SPRITE_SCALE()
-def JUMP_VELOCITY(): return -800.0 * SPRITE_SCALE()
-
-def OBSTACLE_SPEED(): return 400.0 * SPRITE_SCALE()
 OBSTACLE_SPACING_MIN = 3 # * SPRITE_SCALE()
 OBSTACLE_SPACING_MAX = 5 # * SPRITE_SCALE()
+OBSTACLE_POOL_SIZE = 32 # obstacles alive at once (far more than fit on screen)
+OBSTACLE_LIFTS = {"ground": 0, "low": 24, "high": 40} # floating heights, native px above the ground (* SPRITE_SCALE())
 
-def FONT_SMALL(): return max(14, int(WINDOW_HEIGHT() * 0.035))
-def FONT_LARGE(): return max(28, int(WINDOW_HEIGHT() * 0.06))
+UI_MARGIN_FRAC = 0.025 # fraction of window width for margins
 
-# UI relative sizes
+class Metrics(NamedTuple):
+	"""
+	Every layout value for one window size, computed once per resize.
+	Hot code should grab metrics() once and read attributes off it.
+	"""
+	window_width: int
+	window_height: int
+	ground_y: int
+	sprite_scale: int # integer, derived from window height to keep pixel-art crisp
+	tile_size: int
+	player_size: float
+	mascot_size: int
+	obs_size: float
+	heartbeat_size: float
+	player_x: int # relative horizontal player position
+	gravity: float
+	jump_velocity: float
+	obstacle_speed: float
+	font_small: int
+	font_large: int
+	beat_bar_width: int
+	beat_bar_height: int
+	left_margin: int
+	top_margin: int
+
+	@classmethod
+	def for_size(cls, width: int, height: int) -> "Metrics":
+		scale = max(1, int(height / 240))
+		return cls(
+			window_width = width,
+			window_height = height,
+			ground_y = int(height * GROUND_FRACTION),
+			sprite_scale = scale,
+			tile_size = NATIVE_TILE * scale,
+			player_size = NATIVE_PLAYER * scale * 1.5,
+			mascot_size = NATIVE_MASCOT * scale,
+			obs_size = NATIVE_OBS * scale * 1.5,
+			heartbeat_size = NATIVE_BEAT * (scale / 3),
+			player_x = int(width * 0.12),
+			gravity = 2000.0 * scale,
+			jump_velocity = -800.0 * scale,
+			obstacle_speed = 400.0 * scale,
+			font_small = max(14, int(height * 0.035)),
+			font_large = max(28, int(height * 0.06)),
+			beat_bar_width = int(width * 0.28),
+			beat_bar_height = max(14, int(height * 0.028)),
+			left_margin = int(width * UI_MARGIN_FRAC),
+			top_margin = int(height * UI_MARGIN_FRAC),
+		)
+
+_metrics = Metrics.for_size(window_width___internal, window_height___internal)
+_resize_listeners = []
+
+def metrics() -> Metrics:
+	return _metrics
+
+def on_resize(callback):
+	# callback(old_metrics, new_metrics) runs after every set_window_size that changes the size
+	_resize_listeners.append(callback)
+
+def set_window_size(width: int, height: int) -> Metrics:
+	global window_width___internal, window_height___internal, _metrics
+	if (width, height) == (_metrics.window_width, _metrics.window_height):
+		return _metrics
+	old = _metrics
+	window_width___internal = width
+	window_height___internal = height
+	_metrics = Metrics.for_size(width, height)
+	for callback in list(_resize_listeners):
+		callback(old, _metrics)
+	return _metrics
+
+# Function accessors (kept for non-hot code; they read the current snapshot)
+
+def WINDOW_WIDTH(): return _metrics.window_width
+def WINDOW_HEIGHT(): return _metrics.window_height
+def GROUND_Y(): return _metrics.ground_y
+def SPRITE_SCALE(): return _metrics.sprite_scale
+def TILE_SIZE(): return _metrics.tile_size
+def PLAYER_SIZE(): return _metrics.player_size
+def MASCOT_SIZE(): return _metrics.mascot_size
+def OBS_SIZE(): return _metrics.obs_size
+def HEARTBEAT_SIZE(): return _metrics.heartbeat_size
+def PLAYER_X(): return _metrics.player_x
+def GRAVITY(): return _metrics.gravity
+def JUMP_VELOCITY(): return _metrics.jump_velocity
+def OBSTACLE_SPEED(): return _metrics.obstacle_speed
+def FONT_SMALL(): return _metrics.font_small
+def FONT_LARGE(): return _metrics.font_large
 
-def BEAT_BAR_WIDTH(): return int(WINDOW_WIDTH() * 0.28)
-def BEAT_BAR_HEIGHT(): return max(14, int(WINDOW_HEIGHT() * 0.028))
+# UI relative sizes
 
-UI_MARGIN_FRAC = 0.025 # fraction of window width for margins
-def LEFT_MARGIN(): return int(WINDOW_WIDTH() * UI_MARGIN_FRAC)
-def TOP_MARGIN(): return int(WINDOW_HEIGHT() * UI_MARGIN_FRAC)
+def BEAT_BAR_WIDTH(): return _metrics.beat_bar_width
+def BEAT_BAR_HEIGHT(): return _metrics.beat_bar_height
+def LEFT_MARGIN(): return _metrics.left_margin
+def TOP_MARGIN(): return _metrics.top_margin
 
 BEAT_ICON_SCALE_DEFAULT = 1
 BEAT_ICON_SCALE_BEAT = 1.25
@@ -75,6 +146,24 @@ BEAT_TOLERANCE_PERFECT = 0.05
 BEAT_TOLERANCE_GOOD = 0.10
 MUSIC_LATENCY = -0.4
 
+# latency calibration: taps during the warm-up clicks are ignored, then one tap per click is collected
+CALIBRATION_BPM = 100
+CALIBRATION_WARMUP = 4
+CALIBRATION_CLICKS = 16
+CALIBRATION_MIN_TAPS = 8 # steady taps (after outliers are dropped) needed for a result
+CALIBRATION_OUTLIER_MADS = 3.0 # taps further than this many (scaled) median absolute deviations from the median are dropped
+MUSIC_CACHE_BYTES = 48 * 1024 * 1024 # encoded tracks kept in memory for instant restarts (least recently played evicted first)
+
+# mixer buffer presets (frequency, buffer samples, channels), applied at launch; smaller buffers
+# mean less delay between a jump and its judgement sound but can crackle on slow machines.
+# frequency and channels stay the same so compiled asset packs keep matching the mixer
+AUDIO_LATENCY_PRESETS = {
+	"Low": (44100, 256, 2),
+	"Balanced": (44100, 512, 2),
+	"Safe": (44100, 1024, 2),
+}
+AUDIO_LATENCY = "Balanced"
+
 # Assets
 
 ASSET_DIR = ""
@@ -84,6 +173,8 @@ SFX_DIR = os.path.join(ASSET_DIR, "sfx")
 SPRITES_DIR = os.path.join(ASSET_DIR, "sprites")
 ART_DIR = os.path.join(ASSET_DIR, "art")
 DATA_DIR = "build"
+REPORTS_PATH = os.path.join(DATA_DIR, "reports.jsonl")
+PACKS_DIR = os.path.join(DATA_DIR, "packs") # compiled asset packs (python src/pack.py)
 
 FONT_NAME = "PixelifySans"
 FONT_PATH = os.path.join(FONTS_DIR, FONT_NAME, f"{FONT_NAME}.ttf")
@@ -121,6 +212,35 @@ SFX = [
 	("wind"),
 ]
 
+# sfx voices: every category gets its own reserved mixer channels, which are also its voice limit,
+# so a burst in one category can never take channels from another
+SFX_VOICES = {
+	"judgement": 3,
+	"ui": 2,
+	"metronome": 1,
+	"ambience": 2,
+}
+SFX_FREE_CHANNELS = 2 # left unreserved for anything played directly through Sound.play
+SFX_CATEGORY = {
+	"beat_good": "judgement",
+	"beat_miss": "judgement",
+	"beat_perfect": "judgement",
+	"jump": "judgement",
+	"land": "judgement",
+	"powerup_in": "judgement",
+	"powerup_out": "judgement",
+	"rain": "ambience",
+	"wind": "ambience",
+} # anything else is "ui"
+# within a category a sound only replaces a playing one of equal or lower priority (default 0)
+SFX_PRIORITY = {
+	"beat_perfect": 2,
+	"beat_good": 2,
+	"beat_miss": 1,
+	"ui_decide_title": 1,
+	"ui_return_title": 1,
+}
+
 # to adjust
 
 TRACKS = [
@@ -0,0 +1,58 @@
+"""
+Gamepad/joystick input
+"""
+
+import pygame
+import log
+
+# event types the game needs from joysticks (added to the allowed event list)
+EVENT_TYPES = [pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED, pygame.JOYBUTTONDOWN]
+
+polled_ms = 0 # when the last batch of events was taken off the queue (get_ticks clock)
+
+def poll() -> list:
+	# pygame events don't carry their arrival time, so presses are stamped with the time the
+	# queue was drained: a press can be up to a frame older than its stamp, and that wait
+	# can't be measured from here
+	global polled_ms
+	events = pygame.event.get()
+	polled_ms = pygame.time.get_ticks()
+	return events
+
+class GamepadManager:
+	"""
+	Keeps every connected joystick open (arcade buttons wired as joysticks and game pads alike)
+	and turns button presses into jumps. Devices can come and go at any time:
+	SDL sends JOYDEVICEADDED for pads present at startup as well as for hot-plugged ones.
+	"""
+	def __init__(self):
+		self.devices = {} # instance id -> Joystick
+		try:
+			pygame.joystick.init()
+		except pygame.error as e:
+			log.warning("Joystick support unavailable: %s", e)
+
+	def handle_event(self, e) -> bool:
+		# True for a button press
+		if e.type == pygame.JOYBUTTONDOWN:
+			if e.instance_id in self.devices:
+				return True
+		elif e.type == pygame.JOYDEVICEADDED:
+			self._open(e.device_index)
+		elif e.type == pygame.JOYDEVICEREMOVED:
+			joy = self.devices.pop(e.instance_id, None)
+			if joy is not None:
+				log.info("Gamepad disconnected: %s", joy.get_name())
+		return False
+
+	def _open(self, device_index):
+		try:
+			joy = pygame.joystick.Joystick(device_index)
+		except pygame.error as e:
+			log.warning("Could not open gamepad %d: %s", device_index, e)
+			return
+		instance_id = joy.get_instance_id()
+		if instance_id in self.devices:
+			return
+		self.devices[instance_id] = joy
+		log.info("Gamepad connected: %s (%d buttons)", joy.get_name(), joy.get_numbuttons())
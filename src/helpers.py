@@ -2,14 +2,16 @@
 Helper functions
 """
 
-import pygame, math, random, glob, numpy, os
+import pygame, math, random, glob, os, statistics
 import models, audio, constants
 
 def space_obstacle() -> int:
 	return random.randint(constants.OBSTACLE_SPACING_MIN, constants.OBSTACLE_SPACING_MAX)
 
-def get_timing_judgement(clock: models.BeatTracker): # returns a string judgement based on how close the jump was to the beat
-	t = clock.last_beat_time
+def get_timing_judgement(clock: models.BeatTracker, t: float = None): # returns a string judgement based on how close the jump was to the beat
+	# t is the time since the last beat when the jump happened (defaults to the tracker's current phase)
+	if t is None:
+		t = clock.last_beat_time
 	dist = min(abs(t), abs(clock.interval - t))
 
 	if dist <= constants.BEAT_TOLERANCE_PERFECT:
@@ -34,13 +36,27 @@ def get_rank(accuracy):
 	if accuracy >= 70: return "B"
 	return "C"
 
+def latency_stats(offsets, cutoff: float = constants.CALIBRATION_OUTLIER_MADS):
+	# (mean, jitter, kept offsets) after dropping outliers by median absolute deviation, or None
+	# without enough taps; jitter is the standard deviation of the kept offsets (seconds)
+	if len(offsets) < 2:
+		return None
+	median = statistics.median(offsets)
+	mad = statistics.median(abs(o - median) for o in offsets) * 1.4826 # scaled to match a standard deviation
+	limit = cutoff * max(mad, 0.005) # floor so a run of identical taps doesn't reject every other tap
+	kept = [o for o in offsets if abs(o - median) <= limit]
+	if len(kept) < 2:
+		return None
+	return statistics.fmean(kept), statistics.pstdev(kept), kept
+
 def play_ui_sound(audioManager: audio.AudioManager):
 	audioManager.play_sfx("ui_" + str(random.randint(1, 5)))
 
 def get_themed(asset, theme = constants.DEFAULT_THEME.lower(), folder = constants.SPRITES_DIR):
 	return os.path.join(folder, theme, asset)
 
-def load_parallax_layers(folder=os.path.join(constants.SPRITES_DIR, constants.DEFAULT_THEME.lower()), pattern="bg_*", max_value=0.60):
+def parallax_layer_files(folder=os.path.join(constants.SPRITES_DIR, constants.DEFAULT_THEME.lower()), pattern="bg_*", max_value=0.60):
+	# returns [(path, speed)] ordered back to front
 	files = sorted(
 		glob.glob(os.path.join(folder, pattern)),
 		key=lambda f: int(os.path.basename(f).split("_")[1].split(".")[0])
@@ -50,17 +66,22 @@ def load_parallax_layers(folder=os.path.join(constants.SPRITES_DIR, constants.DE
 	if count == 0:
 		return []
 	
-	original_curve = numpy.array([0.1333, 0.3000, 0.5833, 1.0])
-	x_old = numpy.linspace(0, 1, len(original_curve))
-	x_new = numpy.linspace(0, 1, count)
-	values = numpy.interp(x_new, x_old, original_curve) * max_value
+	# resample the speed curve to one value per layer (linear interpolation)
+	original_curve = [0.1333, 0.3000, 0.5833, 1.0]
+	last = len(original_curve) - 1
+	values = []
+	for i in range(count):
+		x = i * last / (count - 1) if count > 1 else 0.0
+		j = min(int(x), last - 1)
+		values.append((original_curve[j] + (original_curve[j + 1] - original_curve[j]) * (x - j)) * max_value)
 
-	layers = [
-		models.ParallaxLayer(f, float(v))
-		for f, v in zip(files, values)
-	]
+	return [(f, float(v)) for f, v in zip(files, values)]
 
-	return layers
+def load_parallax_layers(folder=os.path.join(constants.SPRITES_DIR, constants.DEFAULT_THEME.lower()), pattern="bg_*", max_value=0.60):
+	return [
+		models.ParallaxLayer(f, v)
+		for f, v in parallax_layer_files(folder, pattern, max_value)
+	]
 
 def day_night_tint(phase: float, power: float = 6) -> int:
 	a = phase ** power
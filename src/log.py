@@ -0,0 +1,130 @@
+"""
+Logging
+"""
+
+import json, os, queue, sys, threading, time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+REPORT = 100 # structured run reports, always written
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR", REPORT: "REPORT"}
+
+# records below this level are dropped at the call site (a single int compare)
+level = INFO
+
+_queue = queue.SimpleQueue()
+_worker = None
+_worker_lock = threading.Lock()
+_report_path = None
+_stream = sys.stdout
+_STOP = object()
+
+def configure(min_level: int = INFO, report_path: str = None, stream = None):
+	"""
+	Set the minimum level, where structured run reports are appended (as JSON lines)
+	and which stream plain records go to. Starts the background writer if needed.
+	"""
+	global level, _report_path, _stream
+	level = min_level
+	_report_path = report_path
+	if stream is not None:
+		_stream = stream
+	_ensure_worker()
+
+def set_level(min_level: int):
+	global level
+	level = min_level
+
+def enabled(lvl: int) -> bool:
+	return lvl >= level
+
+# logging calls (formatting is deferred to the writer thread)
+
+def debug(msg: str, *args):
+	if DEBUG >= level:
+		_put(DEBUG, msg, args)
+
+def info(msg: str, *args):
+	if INFO >= level:
+		_put(INFO, msg, args)
+
+def warning(msg: str, *args):
+	if WARNING >= level:
+		_put(WARNING, msg, args)
+
+def error(msg: str, *args):
+	if ERROR >= level:
+		_put(ERROR, msg, args)
+
+def report(event: str, **fields):
+	# fields should be plain JSON-serialisable values (they are read on another thread)
+	_put(REPORT, event, fields)
+
+def shutdown(timeout: float = 1.0):
+	# drain the queue and stop the writer (call once on exit)
+	global _worker
+	with _worker_lock:
+		worker = _worker
+		_worker = None
+	if worker is None:
+		return
+	_queue.put(_STOP)
+	worker.join(timeout)
+
+# internals
+
+def _put(lvl, msg, args):
+	if _worker is None:
+		_ensure_worker()
+	_queue.put((time.time(), lvl, msg, args))
+
+def _ensure_worker():
+	global _worker
+	with _worker_lock:
+		if _worker is None:
+			_worker = threading.Thread(target=_run, name="log-writer", daemon=True)
+			_worker.start()
+
+def _format(stamp, lvl, msg, args):
+	if args:
+		try:
+			msg = msg % args
+		except Exception:
+			msg = f"{msg} {args!r}"
+	clock = time.strftime("%H:%M:%S", time.localtime(stamp))
+	return f"{clock} [{LEVEL_NAMES.get(lvl, lvl)}] {msg}\n"
+
+def _write_report(stamp, event, fields):
+	record = {"time": round(stamp, 3), "event": event}
+	record.update(fields)
+	line = json.dumps(record, separators=(",", ":"))
+	if _report_path:
+		os.makedirs(os.path.dirname(_report_path) or ".", exist_ok=True)
+		with open(_report_path, "a", encoding="utf-8") as f:
+			f.write(line + "\n")
+	# the console line only summarises nested values; the file has them in full
+	brief = {k: (f"<{len(v)} entries>" if isinstance(v, (dict, list)) else v) for k, v in fields.items()}
+	return _format(stamp, REPORT, "%s %s", (event, json.dumps(brief, separators=(",", ":"))))
+
+def _run():
+	while True:
+		item = _queue.get()
+		if item is _STOP:
+			break
+		stamp, lvl, msg, args = item
+		try:
+			if lvl == REPORT:
+				text = _write_report(stamp, msg, args)
+			else:
+				text = _format(stamp, lvl, msg, args)
+			_stream.write(text)
+			# flush once the queue is drained rather than per record
+			if _queue.empty():
+				_stream.flush()
+		except Exception:
+			pass
+	try: _stream.flush()
+	except Exception: pass
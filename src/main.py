@@ -2,26 +2,48 @@
 Main game class
 """
 
-import pygame, sys, os, math, random, asyncio, glob, numpy
-import helpers, models, sprites, particles, audio, ui, settings, constants
+import startup # first, so the startup timings (and the import profile) cover every other import
+import pygame, sys, os, math, random
+import helpers, models, sprites, particles, audio, ui, settings, themes, gamepad, pack, preload, collision, charts, constants, log
 
 class CampfireSandwich:
+	# event types the game reacts to; SDL drops everything else before it reaches the queue
+	# (TEXTINPUT is what fills in KEYDOWN.unicode for text fields)
+	EVENT_TYPES = [
+		pygame.QUIT,
+		pygame.KEYDOWN,
+		pygame.TEXTINPUT,
+		pygame.MOUSEMOTION,
+		pygame.MOUSEBUTTONDOWN,
+		pygame.MOUSEBUTTONUP,
+		pygame.VIDEORESIZE,
+	]
+
 	def __init__(self):
+		# settings are read first: the mixer preset has to be set before pygame.init opens the mixer
+		settings_path = os.path.join(constants.DATA_DIR, "settings.json")
+		self.settings = settings.SettingsManager(settings_path)
+		self.audio_latency = audio.pre_init(self.settings.get("audio_latency"))
+
 		pygame.init()
 		self.screen = pygame.display.set_mode((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.RESIZABLE)
 		pygame.display.set_caption(constants.NAME)
+		startup.mark("window")
+		pygame.event.set_blocked(None)
+		pygame.event.set_allowed(self.EVENT_TYPES + gamepad.EVENT_TYPES)
 		self.clock = pygame.time.Clock()
 
-		# fonts (scale with window height)
+		# fonts (scale with window height, cached per size)
 
-		self.font_small = lambda: pygame.font.Font(constants.FONT_PATH, constants.FONT_SMALL())
-		self.font_large = lambda: pygame.font.Font(constants.FONT_PATH, constants.FONT_LARGE())
+		self._fonts = {}
+		self.font_small = lambda: self._font(constants.FONT_SMALL())
+		self.font_large = lambda: self._font(constants.FONT_LARGE())
 
-		# settings
+		# window resizes are coalesced and applied once the window settles
+		self.pending_size = None
+		self.pending_size_ticks = 0
 
-		# settings file path
-		settings_path = os.path.join(constants.DATA_DIR, "settings.json")
-		self.settings = settings.SettingsManager(settings_path)
+		# settings
 
 		# apply immediately to audio and game state
 		try:
@@ -38,58 +60,52 @@ class CampfireSandwich:
 		self.idle = bool(self.settings.get("idle"))
 		self.intro = bool(self.settings.get("intro"))
 
+		# logging (debug records are only produced when the debug overlay is on)
+		log.configure(log.DEBUG if self.debug else log.INFO, constants.REPORTS_PATH)
+
 		# audio
 
 		self.audio = audio.AudioManager()
 
-		# preload sfx
-		
+		# staged boot: fonts and the title logo are loaded before the first frame; gameplay sprites,
+		# parallax layers and sfx keep decoding in the background (_poll_boot finishes the boot)
+
+		self.boot = preload.Preloader()
+
+		# the title logo (unless the common asset pack has it)
+		packed = pack.open_common()
+		preload_logo = packed is None and os.path.exists(constants.TITLE_LOGO)
+		if preload_logo:
+			self.boot.submit("logo", sprites.images.load, constants.TITLE_LOGO, False)
+
+		# sprites (decoded as a theme bundle on the loader thread; _poll_theme swaps it in through apply_theme)
+		self.theme_loader = themes.ThemeLoader()
+		self.player = None
+		self.mascot = None
+		self.player_sheet = None
+		self.mascot_sheet = None
+		self.bg_layers = []
+		self.tiles_raw = []
+		self.beat_icon_native = None
+		self.theme_loader.request(self.theme, self.boot)
+
+		# sfx (from the common asset pack when there is one)
 		for sfx in constants.SFX:
-			self.audio.load_sfx(sfx, os.path.join(constants.SFX_DIR, f"{sfx}.wav"))
-
-		# sprites
+			self.boot.submit(f"sfx/{sfx}", self.audio.load_sfx, sfx, os.path.join(constants.SFX_DIR, f"{sfx}.wav"), packed)
 
-		self.player_sheet = sprites.SpriteSheet(helpers.get_themed(constants.PLAYER, self.theme))
-		self.player = models.Player(self.player_sheet, self.font_small())
-
-		self.tileset_native = pygame.image.load(helpers.get_themed(constants.TILESET, self.theme)).convert_alpha()
-		self.tiles_native = []
-		native_tiles_count = max(3, self.tileset_native.get_width() // constants.NATIVE_TILE)
-		for i in range(native_tiles_count):
-			surf = pygame.Surface((constants.NATIVE_TILE, constants.NATIVE_TILE), pygame.SRCALPHA)
-			surf.blit(self.tileset_native, (0,0), (i * constants.NATIVE_TILE, 0, constants.NATIVE_TILE, constants.NATIVE_TILE))
-			self.tiles_native.append(pygame.transform.scale(surf, (constants.TILE_SIZE(), constants.TILE_SIZE()))) # scale to constants.TILE_SIZE()
-		
-		# obstacles
-
-		self.obstacles_img = pygame.image.load(helpers.get_themed(constants.OBSTACLES, self.theme)).convert_alpha()
-
-		# split obstacles into frames (assume horizontal strip)
-		self.obstacle_sprites = []
-		count = max(1, self.obstacles_img.get_width() // constants.NATIVE_OBS)
-		for i in range(count):
-			surf = pygame.Surface((constants.NATIVE_OBS, constants.NATIVE_OBS), pygame.SRCALPHA)
-			surf.blit(self.obstacles_img, (0,0), (i * constants.NATIVE_OBS, 0, constants.NATIVE_OBS, constants.NATIVE_OBS))
-			self.obstacle_sprites.append(surf)
-		
-		# mascot
-
-		self.mascot_sheet = sprites.SpriteSheet(helpers.get_themed(constants.MASCOT, self.theme))
-		self.mascot = models.Mascot(self.mascot_sheet, self.font_small(), self.theme)
-
-		# beat bar
+		# fonts for the current window size, opened here while the pool decodes: SDL_ttf shares
+		# one FreeType library that isn't thread-safe, so fonts stay on the main thread
+		for size in {constants.FONT_SMALL(), constants.FONT_LARGE()}:
+			self._fonts[size] = self.boot.timed(f"font/{size}", pygame.font.Font, constants.FONT_PATH, size)
+		if preload_logo:
+			try:
+				self.boot.result("logo")
+			except Exception as e:
+				log.warning("Could not load the title logo: %s", e)
 
-		self.beat_icon_img = None
-		self.beat_marker_img = None
+		# a track picked before the gameplay assets are in starts once they are
+		self.pending_track = None
 
-		if os.path.exists(helpers.get_themed(constants.HEARTBEAT, self.theme)):
-			try:
-				img = pygame.image.load(helpers.get_themed(constants.HEARTBEAT, self.theme)).convert_alpha()
-				target = constants.HEARTBEAT_SIZE()
-				self.beat_icon_img = pygame.transform.scale(img, (target, target))
-			except Exception:
-				self.beat_icon_img = None
-		
 		# beat bar animation state
 		self.beat_icon_scale = constants.BEAT_ICON_SCALE_DEFAULT
 		self.beat_icon_target_scale = constants.BEAT_ICON_SCALE_DEFAULT
@@ -97,10 +113,6 @@ class CampfireSandwich:
 		self.beat_icon_anim_duration = 0.22
 		self.beat_bar_pulse = 0.0
 
-		# parallax
-
-		self.bg_layers = helpers.load_parallax_layers(os.path.join(constants.SPRITES_DIR, self.theme))
-
 		# particles
 
 		self.particles = particles.ParticleSystem(300)
@@ -116,7 +128,6 @@ class CampfireSandwich:
 		# game state
 
 		self.running = True
-		self.restarting = False
 		self.state = "title"
 		self.score = 0
 		self.best_score = 0
@@ -128,6 +139,13 @@ class CampfireSandwich:
 		self.last_judgement = ""
 		self.judgement_timer = 0.0
 
+		# input (jumps are judged at the time the press arrived, not when the frame runs)
+
+		self.gamepad = gamepad.GamepadManager()
+		self.jump_press_ms = None
+		self.frame_latency_ms = None # smoothed poll-to-frame-on-screen time after a press, shown in the debug overlay
+		self._latency_press_ms = None
+
 		# accuracy counters
 
 		self.total_jumps = 0
@@ -135,7 +153,8 @@ class CampfireSandwich:
 
 		# obstacles
 
-		self.obstacles = []
+		self.obstacles = models.ObstaclePool() # reused in place, always in x order
+		self.chart_scheduler = None # set by start_track for songs with a chart
 
 		# UI / shake
 
@@ -151,6 +170,13 @@ class CampfireSandwich:
 		self.raining = False
 		self.rain_timer = 0.0
 
+		# count-in (set up per track by start_track)
+
+		self.countin_active = False
+		self.countin_timer = 0.0
+		self.player_invulnerable_time = 0.0
+		self._suspend_obstacles = False
+
 		# load tracks list
 
 		self.available_tracks = []
@@ -158,37 +184,19 @@ class CampfireSandwich:
 			path = os.path.join(constants.MUSIC_DIR, fn)
 			self.available_tracks.append((path, artist, name, bpm, intro))
 
-		# start a random track
-
-		self.start_random_track()
-
-		# hud
-
-		pause_size = lambda: max(32, int(constants.WINDOW_WIDTH() * 0.04))
-		pause_x = lambda: int(constants.WINDOW_WIDTH() * 0.02)
-		pause_y = lambda: constants.WINDOW_HEIGHT() - pause_size() - int(constants.WINDOW_HEIGHT() * 0.02)
+		# hud (rects are filled in by _layout_hud)
 
 		self.pause_button = ui.Button(
-			(pause_x(), pause_y(), pause_size(), pause_size()),
+			(0, 0, 0, 0),
 			"",
 			self.font_small(),
 			helpers._with_click_sfx(lambda b: self.toggle_pause(), self.audio),
 			radius=8
 		)
 
-		# pause overlay buttons
-		btn_w = lambda: 96 * constants.SPRITE_SCALE()
-		btn_h = lambda: max(48, int(constants.WINDOW_HEIGHT() * 0.07))
-		centre_x = lambda: constants.WINDOW_WIDTH() // 2
-		btn_x = lambda: centre_x() - btn_w()//2
-		prb_y = lambda: int(constants.WINDOW_HEIGHT() * 0.55)
-		ptb_y = lambda: int(constants.WINDOW_HEIGHT() * 0.65)
-		panel_w = lambda: int(constants.WINDOW_WIDTH() * 0.6)
-		panel_x = lambda: constants.WINDOW_WIDTH()//2 - panel_w//2
-
 		# resume button (from pause overlay)
 		self.pause_resume_btn = ui.Button(
-			(btn_x(), prb_y(), btn_w(), btn_h()),
+			(0, 0, 0, 0),
 			"Resume",
 			self.font_large(),
 			helpers._with_click_sfx(lambda b: self.set_state("playing"), self.audio),
@@ -197,7 +205,7 @@ class CampfireSandwich:
 
 		# back to title button (from pause overlay)
 		self.pause_title_btn = ui.Button(
-			(btn_x(), ptb_y(), btn_w(), btn_h()),
+			(0, 0, 0, 0),
 			"Back to Title",
 			self.font_large(),
 			lambda b: self.set_state("title"),
@@ -205,13 +213,8 @@ class CampfireSandwich:
 		)
 
 		# game over buttons (from gameover)
-		go_btn_w = lambda: 96 * constants.SPRITE_SCALE()
-		go_btn_h = lambda: max(48, int(constants.WINDOW_HEIGHT() * 0.06))
-		go_x = lambda: constants.WINDOW_WIDTH()//2 - go_btn_w()//2
-		go_y = lambda: int(constants.WINDOW_HEIGHT()*0.6)
-
 		self.gameover_again_btn = ui.Button(
-			(go_x(), go_y(), go_btn_w(), go_btn_h()),
+			(0, 0, 0, 0),
 			"Play Again",
 			self.font_small(),
 			lambda b: self._play_again(),
@@ -219,22 +222,226 @@ class CampfireSandwich:
 		)
 
 		self.gameover_title_btn = ui.Button(
-			(go_x(), go_y() + go_btn_h() + 12, go_btn_w(), go_btn_h()),
+			(0, 0, 0, 0),
 			"Title Screen",
 			self.font_small(),
 			lambda b: self.set_state("title"),
 			radius=8
 		)
 
-		# mascot position in top-left near HUD
-		self.mascot.x = constants.LEFT_MARGIN()
-		self.mascot.y = constants.TOP_MARGIN()
+		# overlay menus (focus and hit-testing go through their dispatchers)
+		self.pause_menu = ui.ButtonStack([self.pause_resume_btn, self.pause_title_btn])
+		self.gameover_menu = ui.ButtonStack([self.gameover_again_btn, self.gameover_title_btn], keys=(pygame.K_LEFT, pygame.K_RIGHT))
+
+		self._layout_hud()
 
 		# views
 
-		self.title_screen = models.TitleScreen(self)
-		self.song_select = models.SongSelectScreen(self)
-		self.settings_screen = models.SettingsScreen(self)
+		self.title_screen = self.boot.timed("title screen", models.TitleScreen, self)
+		self.song_select = self.boot.timed("song select", models.SongSelectScreen, self)
+		self.settings_screen = self.boot.timed("settings screen", models.SettingsScreen, self)
+		self.calibration_screen = self.boot.timed("calibration screen", models.CalibrationScreen, self)
+
+		# everything size-dependent is rebuilt through this hook
+		constants.on_resize(self._on_resize)
+
+	# theme
+
+	def apply_theme(self, bundle):
+		"""
+		Swap every themed sprite for the ones in a (converted) bundle. Runs between frames;
+		music, game state and object positions are left alone.
+		"""
+		self.theme = bundle.name
+
+		# the old theme's sheets and layers let go of their images (themes.ThemeLoader.trim frees them)
+		for sheet in (self.player_sheet, self.mascot_sheet):
+			if sheet is not None:
+				sheet.release()
+		for layer in self.bg_layers:
+			layer.release()
+
+		# player
+		self.player_sheet = sprites.SpriteSheet(surface=bundle.player)
+		if self.player is None:
+			self.player = models.Player(self.player_sheet, self.font_small())
+		else:
+			self.player.set_sheet(self.player_sheet)
+
+		# ground tiles (native 16x16 slices from the bundle, kept so tiles can be rescaled on resize)
+		self.tiles_raw = bundle.tiles
+		self._scale_tiles()
+
+		# obstacle frames; obstacles already on screen keep their sprite
+		self.obstacle_sprites = bundle.obstacles
+		models.obstacle_frames.prepare(self.obstacle_sprites, (constants.OBS_SIZE(), constants.OBS_SIZE()))
+
+		# mascot
+		self.mascot_sheet = sprites.SpriteSheet(surface=bundle.mascot)
+		if self.mascot is None:
+			self.mascot = models.Mascot(self.mascot_sheet, self.font_small(), self.theme)
+			self._layout_hud()
+		else:
+			self.mascot.set_sheet(self.mascot_sheet, self.theme)
+
+		# beat bar icon
+		self.beat_icon_native = bundle.heartbeat
+		self._scale_beat_icon()
+
+		# parallax (scroll offsets carry over so the swap doesn't jump)
+		offsets = [layer.offset for layer in self.bg_layers]
+		self.bg_layers = [models.ParallaxLayer(None, speed, image=img, night=night) for img, speed, night in bundle.layers]
+		for layer, offset in zip(self.bg_layers, offsets):
+			layer.offset = offset % layer.w
+		if getattr(self, "title_screen", None):
+			self.title_screen.bg_layers = self.bg_layers
+
+	def request_theme(self, name):
+		# decode on the loader thread; _poll_theme swaps it in once ready
+		self.theme_loader.request(name)
+
+	def _poll_theme(self):
+		ready = self.theme_loader.take_ready()
+		if ready is None:
+			return
+		name, bundle = ready
+		if bundle is None and self.player is None:
+			# the saved theme failed at boot: fall back to the default one
+			if name == constants.DEFAULT_THEME.lower():
+				raise RuntimeError(f"could not load the default theme '{name}'")
+			log.warning("Could not load theme '%s', falling back to %s", name, constants.DEFAULT_THEME)
+			self.theme = constants.DEFAULT_THEME.lower()
+			self.theme_loader.request(self.theme, self.boot)
+			return
+		if bundle is None:
+			# failed to load: keep the current theme and put the setting (and its field) back
+			self.settings.set("theme", str(self.theme).capitalize())
+			self.settings_screen._refresh_control("theme")
+			return
+		if name != self.theme or self.player is None:
+			if self.boot is not None:
+				self.boot.timed("apply theme", self.apply_theme, bundle)
+			else:
+				self.apply_theme(bundle)
+			if self.state != "options":
+				# settings keeps the prefetched themes until it closes
+				self.theme_loader.trim(self.theme)
+
+	def _poll_boot(self):
+		# the boot is done once the theme is applied and every background job has finished
+		if self.boot is None or self.player is None or not self.boot.idle():
+			return
+		for sfx in constants.SFX:
+			self.boot.result(f"sfx/{sfx}")
+		self.boot.report()
+		self.boot = None
+		if self.pending_track is not None:
+			track, self.pending_track = self.pending_track, None
+			self.play_track(track)
+
+	def boot_progress(self):
+		# 0..1 while gameplay assets are still loading, None once they are in
+		if self.boot is None:
+			return None
+		progress = self.boot.progress()
+		return min(progress, 0.99) if self.player is None else progress
+
+	# layout (everything here depends on the window size only)
+
+	def _font(self, size):
+		font = self._fonts.get(size)
+		if font is None:
+			font = pygame.font.Font(constants.FONT_PATH, size)
+			self._fonts[size] = font
+		return font
+
+	def _scale_tiles(self):
+		size = constants.TILE_SIZE()
+		self.tiles_native = [pygame.transform.scale(t, (size, size)) for t in self.tiles_raw]
+
+	def _scale_beat_icon(self):
+		if self.beat_icon_native is None:
+			self.beat_icon_img = None
+			return
+		target = constants.HEARTBEAT_SIZE()
+		self.beat_icon_img = pygame.transform.scale(self.beat_icon_native, (target, target))
+
+	def _layout_hud(self):
+		m = constants.metrics()
+		# pause button (bottom left)
+		pause_size = max(32, int(m.window_width * 0.04))
+		pause_x = int(m.window_width * 0.02)
+		pause_y = m.window_height - pause_size - int(m.window_height * 0.02)
+		self.pause_button.rect = pygame.Rect(pause_x, pause_y, pause_size, pause_size)
+		self.pause_button.font = self.font_small()
+		self.pause_button._render_text()
+
+		# pause overlay buttons
+		btn_w = 96 * m.sprite_scale
+		btn_h = max(48, int(m.window_height * 0.07))
+		btn_x = m.window_width // 2 - btn_w // 2
+		for btn, y in ((self.pause_resume_btn, int(m.window_height * 0.55)), (self.pause_title_btn, int(m.window_height * 0.65))):
+			btn.rect = pygame.Rect(btn_x, y, btn_w, btn_h)
+			btn.font = self.font_large()
+			btn._render_text()
+		self.pause_menu.reindex()
+
+		# game over buttons, side by side near the bottom of the panel
+		panel_h = int(m.window_height * 0.45)
+		panel_y = (m.window_height - panel_h) // 2
+		go_btn_w = 96 * m.sprite_scale
+		go_btn_h = max(44, int(m.window_height * 0.06))
+		gap = 24
+		start_x = m.window_width // 2 - (go_btn_w * 2 + gap) // 2
+		go_y = panel_y + int(panel_h * 0.77)
+		for btn, x in ((self.gameover_again_btn, start_x), (self.gameover_title_btn, start_x + go_btn_w + gap)):
+			btn.rect = pygame.Rect(x, go_y, go_btn_w, go_btn_h)
+			btn.font = self.font_small()
+			btn._render_text()
+		self.gameover_menu.reindex()
+
+		# mascot position in top-left near HUD
+		if self.mascot is not None:
+			self.mascot.x = m.left_margin
+			self.mascot.y = m.top_margin
+
+	def _apply_pending_resize(self):
+		if self.pending_size and pygame.time.get_ticks() - self.pending_size_ticks >= constants.RESIZE_SETTLE_MS:
+			size, self.pending_size = self.pending_size, None
+			self.relayout(size)
+
+	def relayout(self, size):
+		"""
+		Apply a new window size without re-initialising the game: the display surface is
+		resized and the new metrics are published; _on_resize rebuilds what depends on them.
+		"""
+		target = (max(1280, size[0]), max(720, size[1]))
+		if self.screen.get_size() != target:
+			flags = 0 if self.state in ("playing", "paused", "gameover") else pygame.RESIZABLE
+			self.screen = pygame.display.set_mode(target, flags)
+		else:
+			self.screen = pygame.display.get_surface()
+		constants.set_window_size(*target)
+
+	def _on_resize(self, old, new):
+		# only size-dependent caches (fonts, scaled sprites, parallax layers, layout) are rebuilt;
+		# loaded assets, audio and game state are kept
+		self._fonts.clear()
+		self._scale_tiles()
+		self._scale_beat_icon()
+		if self.player is not None:
+			self.player.relayout(old)
+			self.mascot.relayout()
+			models.obstacle_frames.prepare(self.obstacle_sprites, (constants.OBS_SIZE(), constants.OBS_SIZE()))
+		for obs in self.obstacles:
+			obs.relayout(old)
+		for layer in self.bg_layers:
+			layer.relayout()
+		self._layout_hud()
+
+		for view in (self.title_screen, self.song_select, self.settings_screen, self.calibration_screen):
+			view.screen = self.screen
+			view.relayout()
 
 	# game state
 
@@ -256,20 +463,37 @@ class CampfireSandwich:
 			except: pass
 		if new_state == "gameover" and prev != "gameover":
 			try:
-				print()
-				print(f"[REPORT] Score: {self.score}")
-				print(f"[REPORT] Best score: {self.best_score}")
-				print(f"[REPORT] Max combo: {self.max_combo}")
-				print(f"[REPORT] Beat accuracy: {helpers.get_accuracy_percent(self.accurate_jumps, self.total_jumps)}%")
-				print(f"[REPORT] Rank: {helpers.get_rank(helpers.get_accuracy_percent(self.accurate_jumps, self.total_jumps))}")
-				print()
+				accuracy = helpers.get_accuracy_percent(self.accurate_jumps, self.total_jumps)
+				log.report(
+					"gameover",
+					track=self.current_track["name"] if self.current_track else None,
+					theme=self.theme,
+					score=int(self.score),
+					best_score=int(self.best_score),
+					max_combo=self.max_combo,
+					jumps=self.total_jumps,
+					accuracy=accuracy,
+					rank=helpers.get_rank(accuracy),
+				)
 				if self.idle:
 					self._play_again()
 					return
 				pygame.mixer.music.set_volume(0.12)
-				self.gameover_again_btn.focus = True
-				self.gameover_title_btn.focus = False
+				self.gameover_menu.focus_manager.set_index(0)
 			except: pass
+		if new_state == "calibrate" and prev != "calibrate":
+			# the clicks need silence
+			pygame.mixer.music.pause()
+			self.calibration_screen.start()
+		if prev == "calibrate" and new_state != "calibrate":
+			self.calibration_screen.stop()
+			pygame.mixer.music.unpause()
+		if new_state == "options" and prev not in ("options", "calibrate"):
+			# warm the other themes so switching in settings is instant
+			self.theme_loader.prefetch(themes.available())
+		if prev == "options" and new_state not in ("options", "calibrate"):
+			# and let them go again once it closes
+			self.theme_loader.trim(self.theme)
 		if new_state == "playing" and prev != "playing":
 			self.screen = pygame.display.set_mode((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()))
 			self.title_screen.title_music_loaded = False
@@ -280,8 +504,7 @@ class CampfireSandwich:
 		if new_state == "paused" and prev != "paused":
 			try:
 				pygame.mixer.music.set_volume(0.12)
-				self.pause_resume_btn.focus = True
-				self.pause_title_btn.focus = False
+				self.pause_menu.focus_manager.set_index(0)
 				self.pause_time_ticks = pygame.time.get_ticks()
 			except: pass
 		if new_state == "playing" and prev == "paused":
@@ -296,7 +519,7 @@ class CampfireSandwich:
 			self.set_state("playing")
 	
 	def _play_again(self):
-		# restart current track and go to playing
+		# restart current track (already in the mixer, so no reload) and go to playing
 		if self.current_track:
 			self.start_track(self.current_track)
 		self.reset()
@@ -316,6 +539,8 @@ class CampfireSandwich:
 		self.countin_timer = 0.0
 		self.player_invulnerable_time = 0.6
 
+		# the click track restarts on the new track's grid (see _sync_metronome)
+		self.audio.metronome.stop()
 		self.audio.load_music(track["path"] + ".ogg")
 		self.audio.play_music(-1)
 		pygame.mixer.music.set_volume(self.master_vol)
@@ -323,6 +548,10 @@ class CampfireSandwich:
 		self.music_start_time = pygame.time.get_ticks() / 1000.0 + self.music_latency
 		self.beat_tracker = models.BeatTracker(60.0 / track["bpm"])
 
+		# charted songs place their obstacles on the chart's beats, others space them randomly
+		chart = charts.load(track["path"], track["bpm"])
+		self.chart_scheduler = charts.ChartScheduler(chart) if chart else None
+
 		# play UI decide sfx
 		try:
 			self.audio.play_sfx("ui_decide_title", 0.9)
@@ -337,6 +566,32 @@ class CampfireSandwich:
 		else:
 			self._suspend_obstacles = False
 
+	def play_track(self, track):
+		# start a track and go to playing, or wait for the boot to finish loading gameplay assets
+		if self.player is None:
+			self.pending_track = track
+			return
+		self.start_track(track)
+		self.set_state("playing")
+
+	def _spawn_charted(self, song_time):
+		m = constants.metrics()
+		chart = self.chart_scheduler.chart
+		spawn_x = m.window_width + int(m.window_width * 0.05)
+		lead = (spawn_x - m.player_x) / m.obstacle_speed
+		i = self.chart_scheduler.pop_due(song_time, lead)
+		while i >= 0:
+			# the count-in still skips obstacles, like with random spacing
+			if not self._suspend_obstacles:
+				index = chart.sprites[i]
+				if index == charts.RANDOM_SPRITE:
+					sprite = random.choice(self.obstacle_sprites)
+				else:
+					sprite = self.obstacle_sprites[index % len(self.obstacle_sprites)]
+				x = m.player_x + (chart.times[i] - song_time) * m.obstacle_speed
+				self.obstacles.spawn(x, sprite, chart.lifts[i])
+			i = self.chart_scheduler.pop_due(song_time, lead)
+
 	def start_random_track(self):
 		if not self.available_tracks:
 			return
@@ -347,11 +602,16 @@ class CampfireSandwich:
 	# input handling
 
 	def handle_events(self):
-		events = pygame.event.get()
+		events = gamepad.poll()
 		jump_pressed = False
+		self.jump_press_ms = None
 
 		for event in events:
-			if event.type == pygame.QUIT:
+			if event.type in gamepad.EVENT_TYPES:
+				if self.gamepad.handle_event(event) and self.state == "playing" and not self.countin_active:
+					jump_pressed = True
+					self._note_press(gamepad.polled_ms)
+			elif event.type == pygame.QUIT:
 				self.running = False
 			elif event.type == pygame.KEYDOWN:
 				if event.key == pygame.K_q and (self.state == "title"):
@@ -369,6 +629,7 @@ class CampfireSandwich:
 				# only allow gameplay jump when playing
 				if self.state == "playing" and event.key in (pygame.K_SPACE, pygame.K_UP) and not self.countin_active:
 					jump_pressed = True
+					self._note_press(gamepad.polled_ms)
 			elif event.type == pygame.VIDEORESIZE:
 				#target_ratio = 16 / 9
 				#h_from_w = event.w / target_ratio
@@ -378,17 +639,17 @@ class CampfireSandwich:
 				#else:
 				#	coord = (w_from_h, event.h)
 
-				constants.window_width___internal = max(1280, event.w)
-				constants.window_height___internal = max(720, event.h)
-
-				self.restart_screen = self.state
-				self.restarting = True
+				# coalesce: only the latest size is applied, once resizing settles
+				self.pending_size = (event.w, event.h)
+				self.pending_size_ticks = pygame.time.get_ticks()
 
 		# route events to state-specific handlers
 		if self.state == "title":
 			self.title_screen.handle_input(events)
 		elif self.state == "options":
 			self.settings_screen.handle_input(events)
+		elif self.state == "calibrate":
+			self.calibration_screen.handle_input(events)
 		elif self.state == "playing":
 			for e in events:
 				if self.countin_active == False:
@@ -396,39 +657,51 @@ class CampfireSandwich:
 						continue
 		elif self.state == "paused":
 			for e in events:
-				if self.pause_resume_btn.handle_event(e):
-					continue
-				if self.pause_title_btn.handle_event(e):
-					continue
-				if e.type == pygame.KEYDOWN:
-					if e.key in (pygame.K_UP, pygame.K_DOWN):
-						# toggle focus
-						self.pause_resume_btn.focus, self.pause_title_btn.focus = self.pause_title_btn.focus, self.pause_resume_btn.focus
-					elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
-						focused = self.pause_resume_btn if self.pause_resume_btn.focus else self.pause_title_btn
-						focused._click()
+				self.pause_menu.handle_event(e)
 		elif self.state == "song_select":
 			self.song_select.handle_input(events)
 			return False
 		elif self.state == "gameover":
 			for e in events:
-				if self.gameover_title_btn.handle_event(e):
-					continue
-				if self.gameover_again_btn.handle_event(e):
-					continue
-				if e.type == pygame.KEYDOWN:
-					if e.key in (pygame.K_LEFT, pygame.K_RIGHT):
-						# toggle focus
-						self.gameover_title_btn.focus, self.gameover_again_btn.focus = self.gameover_again_btn.focus, self.gameover_title_btn.focus
-					elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
-						focused = self.gameover_title_btn if self.gameover_title_btn.focus else self.gameover_again_btn
-						focused._click()
+				self.gameover_menu.handle_event(e)
 
 		return jump_pressed
+
+	def _note_press(self, press_ms):
+		# keep the earliest press of the frame
+		if self.jump_press_ms is None or press_ms < self.jump_press_ms:
+			self.jump_press_ms = press_ms
+
+	def _sync_metronome(self):
+		# the click track runs while playing with the beat sound on, once any count-in is over;
+		# started at the grid's current phase so its (sample-accurate) clicks land on the beats.
+		# the calibration screen runs its own click track, so it's left alone there
+		if self.state == "calibrate":
+			return
+		track = self.current_track
+		want = self.state == "playing" and self.beat_sound and self.music_started and track and not self._suspend_obstacles
+		if want and self.audio.metronome.bpm != track["bpm"]:
+			self.audio.metronome.start(track["bpm"], pygame.time.get_ticks() / 1000.0 - self.music_start_time)
+		elif not want and self.audio.metronome.bpm is not None:
+			self.audio.metronome.stop()
+
+	def _beat_phase_at(self, ms):
+		# time since the last beat at a given get_ticks() time, or None without a music clock
+		if ms is None or not (self.music_started and self.current_track):
+			return None
+		absolute_time = ms / 1000.0 - self.music_start_time
+		if absolute_time < 0:
+			return None
+		return absolute_time % self.beat_tracker.interval
 	
 	# game update
 
 	def update(self, dt, jump_pressed):
+		m = constants.metrics()
+		# one clock advance animates every sprite; gameplay sprites hold still outside play (e.g. behind the pause overlay)
+		sprites.tick(dt, self.state == "playing")
+		self._sync_metronome()
+
 		# title screen update
 		if self.state == "title":
 			#self.title_screen = models.TitleScreen(self)
@@ -441,6 +714,11 @@ class CampfireSandwich:
 			self.settings_screen.update(dt)
 			return
 
+		# latency calibration (clicks are timed in its update)
+		if self.state == "calibrate":
+			self.calibration_screen.update(dt)
+			return
+
 		# song select screen
 		if self.state == "song_select":
 			#self.song_select = models.SongSelectScreen(self)
@@ -450,13 +728,11 @@ class CampfireSandwich:
 		# pause screen
 		if self.state == "paused":
 			self.particles.update(dt)
-			self.mascot.update(dt)
 			return
 
 		# gameover state: keep particles/mascot animating
 		if self.state == "gameover":
 			self.particles.update(dt)
-			self.mascot.update(dt)
 			return
 
 		if getattr(self, "player_invulnerable_time", 0.0) > 0.0:
@@ -480,21 +756,16 @@ class CampfireSandwich:
 		beat_triggered = self.beat_tracker.update(dt, absolute_time)
 
 		if beat_triggered:
-			print()
-			print(f"[DEBUG] Time of day: {self.time_of_day}")
-			print(f"[DEBUG] Absolute time in game: {absolute_time}")
-			print(f"[DEBUG] Beats until next obstacle: {self.beats_until_next_obstacle}")
-			print()
-
-			if self._suspend_obstacles == False:
-				if self.beat_sound:
-					self.audio.play_sfx("ui_1", 1)
+			log.debug("Beat %d: time of day %.3f, absolute time %s, beats until next obstacle %d",
+				self.beat_tracker.beat_count, self.time_of_day, absolute_time, self.beats_until_next_obstacle)
 
+			charted = self.chart_scheduler is not None and not self.chart_scheduler.done()
+			if self._suspend_obstacles == False and not charted:
 				if self.beats_until_next_obstacle == 0:
 					# spawn obstacle
-					spawn_x = constants.WINDOW_WIDTH() + int(constants.WINDOW_WIDTH() * 0.05)
+					spawn_x = m.window_width + int(m.window_width * 0.05)
 					sprite = random.choice(self.obstacle_sprites)
-					self.obstacles.append(models.Obstacle(spawn_x, sprite))
+					self.obstacles.spawn(spawn_x, sprite)
 
 				if (self.beats_until_next_obstacle > -1):
 					# count down until next obstacle
@@ -521,8 +792,10 @@ class CampfireSandwich:
 			# count jumps
 			self.total_jumps += 1
 
-			# determine judgement
-			judgement = helpers.get_timing_judgement(self.beat_tracker)
+			# determine judgement (at press time when we know it)
+			judgement = helpers.get_timing_judgement(self.beat_tracker, self._beat_phase_at(self.jump_press_ms))
+			if self.jump_press_ms is not None:
+				self._latency_press_ms = self.jump_press_ms
 			self.last_judgement = judgement
 			self.judgement_timer = 0.6 # show for 0.6s
 
@@ -559,63 +832,32 @@ class CampfireSandwich:
 
 		# update obstacles
 		for obs in self.obstacles:
-			obs.update(dt)
-		
-		# collision
-		player_rect = self.player.rect
-		player_mask = self.player.get_mask()
+			obs.update(dt, m.obstacle_speed)
 
-		if self.player_invulnerable_time > 0.0:
-			pass
-		else:
-			for obs in self.obstacles:
-				# quick reject by rect
-				if not player_rect.colliderect(obs.rect):
-					continue
-
-				# ensure obstacle has a mask
-				obs_mask = getattr(obs, "mask", None)
-				if obs_mask is None:
-					# fallback: treat as rect collision if no mask
-					self.set_state("gameover")
-					self.best_score = max(self.best_score, self.score)
-					self.audio.play_sfx("beat_miss", 0.8)
-					self.apply_screen_shake(6, 0.18)
-					break
-
-				# compute offset from player mask to obstacle mask
-				offset_x = int(obs.rect.x - player_rect.x)
-				offset_y = int(obs.rect.y - player_rect.y)
-
-				# if either mask is missing, skip
-				if player_mask is None:
-					# fallback to rect collision
-					self.set_state("gameover")
-					self.best_score = max(self.best_score, self.score)
-					self.audio.play_sfx("beat_miss", 0.8)
-					self.apply_screen_shake(6, 0.18)
-					break
-
-				# check overlap: returns point or None
-				overlap_point = player_mask.overlap(obs_mask, (offset_x, offset_y))
-				if overlap_point:
-					# pixel-perfect collision detected
-					self.set_state("gameover")
-					self.best_score = max(self.best_score, self.score)
-					self.audio.play_sfx("beat_miss", 0.8)
-					self.apply_screen_shake(6, 0.18)
-					break
-		
-		# remove offscreen
-		self.obstacles = [o for o in self.obstacles if not o.offscreen()]
+		# charted obstacles: handed out early enough to scroll in from the spawn edge, and placed
+		# so they reach the player exactly on their beat
+		if self.chart_scheduler is not None and absolute_time is not None:
+			self._spawn_charted(absolute_time)
 		
+		# collision (swept from last frame's positions, so a slow frame can't skip an obstacle)
+		if self.player_invulnerable_time <= 0.0:
+			hit = collision.sweep(self.player, self.obstacles)
+			if hit is not None:
+				log.debug("Hit obstacle at %s, %.0f%% through the frame", hit.point, hit.time * 100)
+				self.set_state("gameover")
+				self.best_score = max(self.best_score, self.score)
+				self.audio.play_sfx("beat_miss", 0.8)
+				self.apply_screen_shake(6, 0.18)
+
+		# recycle offscreen
+		self.obstacles.recycle_passed()
+
 		# passive score over time
 		if self.countin_active is False:
-			self.score += dt * 2 * constants.SPRITE_SCALE() # small survival score
+			self.score += dt * 2 * m.sprite_scale # small survival score
 
-		# particles and mascot update
+		# particles update
 		self.particles.update(dt)
-		self.mascot.update(dt)
 
 		# judgement timer
 		if self.judgement_timer > 0:
@@ -631,7 +873,7 @@ class CampfireSandwich:
 			self.rain_timer = random.uniform(8.0, 20.0)
 			self.raining = random.random() < 0.25
 			if self.raining:
-				self.particles.emit_rain(constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT(), count = 60)
+				self.particles.emit_rain(m.window_width, m.window_height, count = 60)
 		
 		# advance beat icon animation
 
@@ -655,6 +897,7 @@ class CampfireSandwich:
 	# rendering
 
 	def draw_ground(self, surf):
+		m = constants.metrics()
 		# tiles_native[0] = ground tile (top soil)
 		# tiles_native[1] = grass edge (drawn above ground)
 		# tiles_native[2] = shadow/subsoil (drawn below ground repeatedly)
@@ -669,22 +912,22 @@ class CampfireSandwich:
 		if len(tiles) > 1:
 			grass = tiles[1]
 			x = 0
-			while x < constants.WINDOW_WIDTH():
-				surf.blit(grass, (x, constants.GROUND_Y()))
-				x += constants.TILE_SIZE()
+			while x < m.window_width:
+				surf.blit(grass, (x, m.ground_y))
+				x += m.tile_size
 
 		# draw tiles below ground to bottom of screen
 		if len(tiles) > 2:
 			ground = tiles[0]
-			y = constants.GROUND_Y() + constants.TILE_SIZE()
-			while y < constants.WINDOW_HEIGHT():
+			y = m.ground_y + m.tile_size
+			while y < m.window_height:
 				x = 0
-				while x < constants.WINDOW_WIDTH():
+				while x < m.window_width:
 					surf.blit(ground, (x, y))
-					x += constants.TILE_SIZE()
-				y += constants.TILE_SIZE()
+					x += m.tile_size
+				y += m.tile_size
 		else:
-			pygame.draw.rect(surf, (40, 36, 32), pygame.Rect(0, constants.GROUND_Y() + constants.TILE_SIZE(), constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT() - (constants.GROUND_Y() + constants.TILE_SIZE()))) # fallback
+			pygame.draw.rect(surf, (40, 36, 32), pygame.Rect(0, m.ground_y + m.tile_size, m.window_width, m.window_height - (m.ground_y + m.tile_size))) # fallback
 		
 	def draw_beat_bar(self, surf):
 		"""
@@ -695,11 +938,12 @@ class CampfireSandwich:
 		- Tiny centre marker sprite
 		- Compact layout so it fits UI
 		"""
+		m = constants.metrics()
 		# layout
-		bar_w = constants.BEAT_BAR_WIDTH()
-		bar_h = constants.BEAT_BAR_HEIGHT()
-		margin = int(constants.WINDOW_WIDTH() * constants.UI_MARGIN_FRAC)
-		x = constants.WINDOW_WIDTH() - bar_w - margin
+		bar_w = m.beat_bar_width
+		bar_h = m.beat_bar_height
+		margin = int(m.window_width * constants.UI_MARGIN_FRAC)
+		x = m.window_width - bar_w - margin
 		y = margin
 
 		# apply pulse scale (cute pop)
@@ -728,7 +972,7 @@ class CampfireSandwich:
 
 		# centre marker
 		cx = x + bar_w // 2
-		pygame.draw.line(surf, constants.BEAT_MARKER_COLOUR, (cx, y-4), (cx, y+bar_h+4), max(1, int(constants.WINDOW_WIDTH() * 0.0015)))
+		pygame.draw.line(surf, constants.BEAT_MARKER_COLOUR, (cx, y-4), (cx, y+bar_h+4), max(1, int(m.window_width * 0.0015)))
 		
 		# animated beat icon (left side of fill, or if no fill, at left edge)
 		icon_x = x + max(6, int(bar_h * 0.2))
@@ -749,11 +993,17 @@ class CampfireSandwich:
 			label = ""
 			if self.debug:
 				label = f"{int(self.clock.get_fps())} FPS - "
+				if self.frame_latency_ms is not None:
+					label += f"poll to flip {self.frame_latency_ms:.0f} ms - "
+				audio_ms = self.audio.output_latency_ms()
+				if audio_ms is not None:
+					label += f"audio ~{audio_ms:.0f} ms - "
 			label += f"{self.current_track['bpm']} BPM"
 			lbl = self.font_small().render(label, True, (120, 110, 100))
-			surf.blit(lbl, (x + bar_w - lbl.get_width(), y + bar_h + int(constants.WINDOW_HEIGHT() * 0.006)))
+			surf.blit(lbl, (x + bar_w - lbl.get_width(), y + bar_h + int(m.window_height * 0.006)))
 
 	def draw_judgement(self, surf):
+		m = constants.metrics()
 		if self.judgement_timer > 0 and self.last_judgement:
 			surf_text = self.font_small().render(self.last_judgement, True, constants.TEXT_COLOUR)
 			bar_width = self.beat_bar_w
@@ -761,37 +1011,39 @@ class CampfireSandwich:
 			bar_x = self.beat_bar_x
 			bar_y = self.beat_bar_y
 			x = bar_x + bar_width - surf_text.get_width()
-			y = bar_y + bar_height + int(constants.WINDOW_HEIGHT() * 0.05)
+			y = bar_y + bar_height + int(m.window_height * 0.05)
 			colour = (200, 255, 200) if "Perfect" in self.last_judgement else (220, 220, 180) if "Good" in self.last_judgement else (255, 200, 180) # colour code
 			surf_text = self.font_small().render(self.last_judgement, True, colour)
 			surf.blit(surf_text, (x, y))
 
 	def draw_track_info(self, surf):
+		m = constants.metrics()
 		if not self.current_track:
 			return
 		
 		text = f"{self.current_track['path']}.ogg" if self.debug else f"{self.current_track['artist']} - {self.current_track['name']} ({self.current_track['bpm']} BPM)"
 		surf_text = self.font_small().render(text, True, constants.TEXT_COLOUR)
 
-		margin = int(constants.WINDOW_WIDTH() * constants.UI_MARGIN_FRAC)
-		bottom_tile_top = constants.GROUND_Y() + constants.TILE_SIZE()
+		margin = int(m.window_width * constants.UI_MARGIN_FRAC)
+		bottom_tile_top = m.ground_y + m.tile_size
 
 		# position: above bottom shadow tiles, aligned to bottom-right tile grid
 
-		x = constants.WINDOW_WIDTH() - surf_text.get_width() - margin
-		y = max(bottom_tile_top - surf_text.get_height() - int(constants.WINDOW_HEIGHT() * 0.01), constants.WINDOW_HEIGHT() - surf_text.get_height() - margin)
+		x = m.window_width - surf_text.get_width() - margin
+		y = max(bottom_tile_top - surf_text.get_height() - int(m.window_height * 0.01), m.window_height - surf_text.get_height() - margin)
 		surf.blit(surf_text, (x, y))
 
 	def draw_hud(self, surf):
+		m = constants.metrics()
 		# mascot, scaled to match text height (left)
-		mascot_size = max(constants.MASCOT_SIZE(), int(self.font_small().get_height() * 1.2))
-		mascot_x = constants.LEFT_MARGIN()
-		mascot_y = constants.TOP_MARGIN()
+		mascot_size = max(m.mascot_size, int(self.font_small().get_height() * 1.2))
+		mascot_x = m.left_margin
+		mascot_y = m.top_margin
 		self.mascot.draw(surf, x=mascot_x, y=mascot_y, size=mascot_size)
 
 		# info cluster (left)
-		text_x = mascot_x + mascot_size + int(constants.WINDOW_WIDTH() * 0.01)
-		line_h = self.font_small().get_height() + int(constants.WINDOW_HEIGHT() * 0.008)
+		text_x = mascot_x + mascot_size + int(m.window_width * 0.01)
+		line_h = self.font_small().get_height() + int(m.window_height * 0.008)
 		y0 = mascot_y
 
 		# score
@@ -835,59 +1087,67 @@ class CampfireSandwich:
 		self.shake_intensity = intensity
 
 	def draw_game_over(self, surf):
+		m = constants.metrics()
 		# dim background
-		overlay = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.SRCALPHA)
+		overlay = pygame.Surface((m.window_width, m.window_height), pygame.SRCALPHA)
 		overlay.fill((8, 8, 10, 200))
 		surf.blit(overlay, (0, 0))
 
-		panel_w = int(constants.WINDOW_WIDTH() * 0.6) # centre panel in the middle of the window
-		panel_h = int(constants.WINDOW_HEIGHT() * 0.45)
-		panel_x = (constants.WINDOW_WIDTH() - panel_w) // 2
-		panel_y = (constants.WINDOW_HEIGHT() - panel_h) // 2
+		panel_w = int(m.window_width * 0.6) # centre panel in the middle of the window
+		panel_h = int(m.window_height * 0.45)
+		panel_x = (m.window_width - panel_w) // 2
+		panel_y = (m.window_height - panel_h) // 2
 		ui.draw_panel(surf, pygame.Rect(panel_x, panel_y, panel_w, panel_h), (40,36,44), (120,100,90))
 		title = self.font_large().render("GAME OVER", True, constants.TEXT_COLOUR)
-		surf.blit(title, (constants.WINDOW_WIDTH()//2 - title.get_width()//2, panel_y + int(panel_h * 0.06)))
+		surf.blit(title, (m.window_width//2 - title.get_width()//2, panel_y + int(panel_h * 0.06)))
 		score_info = self.font_small().render(f"Score: {int(self.score)}   Best: {int(self.best_score)}   Max Combo: {self.max_combo}", True, constants.TEXT_COLOUR)
-		surf.blit(score_info, (constants.WINDOW_WIDTH()//2 - score_info.get_width()//2, panel_y + int(panel_h * 0.22)))
+		surf.blit(score_info, (m.window_width//2 - score_info.get_width()//2, panel_y + int(panel_h * 0.22)))
 		accuracy = helpers.get_accuracy_percent(self.accurate_jumps, self.total_jumps)
 		acc_text = self.font_small().render(f"Beat Accuracy: {accuracy}%", True, constants.TEXT_COLOUR)
-		surf.blit(acc_text, (constants.WINDOW_WIDTH()//2 - acc_text.get_width()//2, panel_y + int(panel_h * 0.34)))
+		surf.blit(acc_text, (m.window_width//2 - acc_text.get_width()//2, panel_y + int(panel_h * 0.34)))
 		rank = helpers.get_rank(accuracy)
 		rank_text = self.font_small().render(f"Rank: {rank}", True, constants.TEXT_COLOUR)
-		surf.blit(rank_text, (constants.WINDOW_WIDTH()//2 - rank_text.get_width()//2, panel_y + int(panel_h * 0.44)))
+		surf.blit(rank_text, (m.window_width//2 - rank_text.get_width()//2, panel_y + int(panel_h * 0.44)))
 		#hint = self.font_small().render("Press R / Enter / Space to restart", True, constants.TEXT_COLOUR)
 		#surf.blit(hint, (constants.WINDOW_WIDTH()//2 - hint.get_width()//2, panel_y + int(panel_h * 0.62)))
 
-		# buttons
-		btn_w = 96 * constants.SPRITE_SCALE()
-		btn_h = max(44, int(constants.WINDOW_HEIGHT() * 0.06))
-		gap = 24
-		total_w = btn_w * 2 + gap
-		start_x = constants.WINDOW_WIDTH()//2 - total_w//2
-		y = panel_y + int(panel_h * 0.77)
-
-		self.gameover_again_btn.rect.topleft = (start_x, y)
-		self.gameover_again_btn.rect.size = (btn_w, btn_h)
-		self.gameover_again_btn._render_text()
-
-		self.gameover_title_btn.rect.topleft = (start_x + btn_w + gap, y)
-		self.gameover_title_btn.rect.size = (btn_w, btn_h)
-		self.gameover_title_btn._render_text()
-
+		# buttons (laid out by _layout_hud)
 		self.gameover_title_btn.draw(surf)
 		self.gameover_again_btn.draw(surf)
 
 	# render
 
+	def draw_boot_progress(self, surf):
+		# thin bar along the bottom edge while gameplay assets load in the background
+		progress = self.boot_progress()
+		if progress is None:
+			return
+		m = constants.metrics()
+		h = max(4, int(m.window_height * 0.006))
+		bar = pygame.Rect(0, m.window_height - h, m.window_width, h)
+		pygame.draw.rect(surf, constants.BEAT_BAR_BG_COLOUR, bar)
+		pygame.draw.rect(surf, constants.BEAT_BAR_COLOUR, (0, bar.y, int(bar.w * progress), h))
+		text = "Starting..." if self.pending_track is not None else f"Loading {int(progress * 100)}%"
+		label = self.font_small().render(text, True, constants.TEXT_COLOUR)
+		surf.blit(label, (m.window_width - label.get_width() - m.left_margin, bar.y - label.get_height() - h))
+
 	def render(self):
+		m = constants.metrics()
 		# title screen
 		if self.state == "title":
 			self.title_screen.draw()
+			self.draw_boot_progress(self.screen)
 			pygame.display.flip()
 			return
 
 		if self.state == "options":
 			self.settings_screen.draw()
+			self.draw_boot_progress(self.screen)
+			pygame.display.flip()
+			return
+
+		if self.state == "calibrate":
+			self.calibration_screen.draw()
 			pygame.display.flip()
 			return
 		
@@ -895,6 +1155,7 @@ class CampfireSandwich:
 
 		if self.state == "song_select":
 			self.song_select.draw()
+			self.draw_boot_progress(self.screen)
 			pygame.display.flip()
 			return
 
@@ -902,11 +1163,11 @@ class CampfireSandwich:
 		tint = (t, t, t)
 
 		# draw to scene surface for shake
-		scene = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()))
+		scene = pygame.Surface((m.window_width, m.window_height))
 		scene.fill((t, t, t))
 
 		# camera_dx: use obstacle speed as camera reference (pixels/sec)
-		camera_dx = constants.OBSTACLE_SPEED()
+		camera_dx = m.obstacle_speed
 
 		for layer in self.bg_layers:
 			alpha = (255 * ((1 - (t / 255)) ** 4)) if layer.night else None
@@ -914,18 +1175,13 @@ class CampfireSandwich:
 			layer.draw(scene, alpha)
 
 		# day/night tint
-		overlay = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()))
+		overlay = pygame.Surface((m.window_width, m.window_height))
 		overlay.fill(tint)
 		overlay.set_alpha(50)
 		scene.blit(overlay, (0, 0))
 
-		# player squash/stretch micro-animations
-		scale_x, scale_y = 1.0, 1.0
-		if self.player.vy < -50 * constants.SPRITE_SCALE():
-			scale_y = 1.06; scale_x = 0.96
-		elif self.player.on_ground and self.player.recently_landed:
-			scale_y = 0.9; scale_x = 1.12
-		self.player.draw(scene, scale_x, scale_y)
+		# player (with its squash/stretch micro-animations)
+		self.player.draw(scene)
 
 		# obstacles
 		for obs in self.obstacles:
@@ -942,7 +1198,7 @@ class CampfireSandwich:
 
 		# subtle rain overlay
 		if self.raining:
-			rain_overlay = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.SRCALPHA)
+			rain_overlay = pygame.Surface((m.window_width, m.window_height), pygame.SRCALPHA)
 			rain_overlay.fill((180, 200, 230, 20))
 			scene.blit(rain_overlay, (0, 0))
 		
@@ -951,7 +1207,7 @@ class CampfireSandwich:
 
 		if self.countin_active:
 			# dim the whole screen
-			dim = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), flags=pygame.SRCALPHA)
+			dim = pygame.Surface((m.window_width, m.window_height), flags=pygame.SRCALPHA)
 			dim.fill((0, 0, 0, 160))
 
 			scene.blit(dim, (0, 0))
@@ -967,8 +1223,8 @@ class CampfireSandwich:
 
 			txt_surf = font.render(text, True, (250, 250, 250))
 			shadow = font.render(text, True, (20, 20, 20))
-			cx = constants.WINDOW_WIDTH() // 2
-			cy = constants.WINDOW_HEIGHT() // 2
+			cx = m.window_width // 2
+			cy = m.window_height // 2
 			scene.blit(shadow, (cx - shadow.get_width()//2 + 4, cy - shadow.get_height()//2 + 4))
 			scene.blit(txt_surf, (cx - txt_surf.get_width()//2, cy - txt_surf.get_height()//2))
 
@@ -984,7 +1240,7 @@ class CampfireSandwich:
 
 		# subtle judgement flash on perfect
 		if "Perfect" in self.last_judgement and self.judgement_timer > 0:
-			flash = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.SRCALPHA)
+			flash = pygame.Surface((m.window_width, m.window_height), pygame.SRCALPHA)
 			alpha = int(120 * (self.judgement_timer / 0.6))
 			flash.fill((220, 255, 200, alpha))
 			scene.blit(flash, (0, 0))
@@ -1004,14 +1260,14 @@ class CampfireSandwich:
 
 		if self.state == "paused":
 			# then dim
-			overlay = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.SRCALPHA)
+			overlay = pygame.Surface((m.window_width, m.window_height), pygame.SRCALPHA)
 			overlay.fill((8, 8, 10, 200))
 			self.screen.blit(overlay, (0, 0))
 			
 			# draw options panel centred
-			ui.draw_panel(self.screen, pygame.Rect(constants.WINDOW_WIDTH()*0.2, constants.WINDOW_HEIGHT()*0.2, constants.WINDOW_WIDTH()*0.6,  constants.WINDOW_HEIGHT()*0.6), (40, 36, 44), (120, 100, 90), subtitle="Press ESC to return", subtitle_font=self.font_small)
+			ui.draw_panel(self.screen, pygame.Rect(m.window_width*0.2, m.window_height*0.2, m.window_width*0.6,  m.window_height*0.6), (40, 36, 44), (120, 100, 90), subtitle="Press ESC to return", subtitle_font=self.font_small)
 			title = self.font_large().render("Paused", True, constants.TEXT_COLOUR)
-			self.screen.blit(title, (constants.WINDOW_WIDTH()//2 - title.get_width()//2, int(constants.WINDOW_HEIGHT()*0.3)))
+			self.screen.blit(title, (m.window_width//2 - title.get_width()//2, int(m.window_height*0.3)))
 
 			# buttons
 			self.pause_resume_btn.draw(self.screen)
@@ -1019,6 +1275,13 @@ class CampfireSandwich:
 		
 		pygame.display.flip()
 
+		# from draining a press until the frame that reacts to it is on screen (the time the press
+		# waited in the queue before that isn't known, see gamepad.poll)
+		if self._latency_press_ms is not None:
+			sample = pygame.time.get_ticks() - self._latency_press_ms
+			self.frame_latency_ms = sample if self.frame_latency_ms is None else self.frame_latency_ms * 0.8 + sample * 0.2
+			self._latency_press_ms = None
+
 	# reset
 	
 	def reset(self):
@@ -1033,29 +1296,27 @@ class CampfireSandwich:
 		self.accurate_jumps = 0
 		self.beats_until_next_obstacle = helpers.space_obstacle()
 
-		# restart music
-		if self.current_track:
-			try:
-				self.audio.play_music(-1)
-				self.music_start_time = pygame.time.get_ticks() / 1000.0 + self.music_latency
-				self.music_started = True
-			except Exception:
-				self.music_started = False
-
 	# main loop
 
 	def run(self):
+		first_frame = True
 		while self.running:
-			if self.restarting:
-				self.__init__()
-				self.set_state(self.restart_screen)
+			self._poll_theme()
+			self._poll_boot()
+			self._apply_pending_resize()
 			dt_ms = self.clock.tick(constants.FPS)
 			dt = dt_ms / 1000.0
 
 			jump_pressed = self.handle_events()
 			self.update(dt, jump_pressed)
 			self.render()
+			if first_frame:
+				first_frame = False
+				startup.mark("first frame")
+				startup.check_budget("window", constants.STARTUP_BUDGET_MS)
 
+		self.settings.flush()
+		log.shutdown()
 		pygame.quit()
 		sys.exit()
 
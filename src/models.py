@@ -3,22 +3,40 @@ Game objects
 """
 
 import os, pygame, random
-import sprites, particles, ui, helpers, settings, constants
+import sprites, particles, ui, helpers, settings, themes, pack, gamepad, constants, log
 
 # Game objects
 
 class Player: # player
+	# squash/stretch variants drawn (and collided) instead of the plain frame: (scale x, scale y)
+	SQUASH = {
+		"stretch": (0.96, 1.06), # rising
+		"squash": (1.12, 0.9), # the frame it lands
+	}
+
 	def __init__(self, spritesheet: sprites.SpriteSheet, font):
 		# store native frames then scale for rendering
 		self.x = constants.PLAYER_X()
 		self.y = float(constants.GROUND_Y() - constants.PLAYER_SIZE())
+		self.prev_y = self.y # where the last update started (collision sweeps from here)
 		self.vy = 0.0
 		self.on_ground = True
 		self.land_time_remaining = 0.0
 		self.recently_landed = False
-		self.spritesheet = spritesheet
 		self.animations = {}
 		self.anim_durations = {}
+		self.native_frames = {} # unscaled frames per animation, kept for relayout
+		self.frames = {} # animation -> per frame {variant: sprites.MaskedFrame}, None being the plain frame
+		self.set_sheet(spritesheet)
+
+		self.state = "idle"
+		self.font = font
+		self.width = constants.PLAYER_SIZE()
+		self.height = constants.PLAYER_SIZE()
+
+	def set_sheet(self, spritesheet: sprites.SpriteSheet):
+		# (re)build animations from a sheet; used on creation and when the theme changes
+		self.spritesheet = spritesheet
 		frames = 4
 
 		anim_rows = [
@@ -30,51 +48,79 @@ class Player: # player
 		# load native frames (24x24) and scale them to constants.PLAYER_SIZE()/constants.PLAYER_SIZE()
 		for row, name, fps in anim_rows:
 			native_frames = spritesheet.load_strip((0, row * constants.NATIVE_PLAYER, constants.NATIVE_PLAYER, constants.NATIVE_PLAYER), frames)
-			scaled_frames = [pygame.transform.scale(f, (constants.PLAYER_SIZE(), constants.PLAYER_SIZE())) for f in native_frames]
-			self.animations[name] = sprites.AnimatedSprite(scaled_frames, fps=fps, loop=True)
+			self.native_frames[name] = native_frames
+			if name not in self.animations:
+				self.animations[name] = sprites.AnimatedSprite([], fps=fps, loop=True, clock=sprites.game_clock)
 			self.anim_durations[name] = frames / float(fps)
-
-		self.state = "idle"
-		self.font = font
-		self.width = constants.PLAYER_SIZE()
-		self.height = constants.PLAYER_SIZE()
-
-		self._mask_cache = {}
+		self._build_frames(constants.PLAYER_SIZE())
+
+	def _build_frames(self, size):
+		# every frame in every squash variant, with masks, for the current size
+		for name, native_frames in self.native_frames.items():
+			variants = []
+			for native in native_frames:
+				plain = pygame.transform.scale(native, (size, size))
+				frame = {None: sprites.masked(plain)}
+				for variant, (sx, sy) in Player.SQUASH.items():
+					frame[variant] = sprites.masked(pygame.transform.scale(plain, (max(1, int(size * sx)), max(1, int(size * sy)))))
+				variants.append(frame)
+			self.frames[name] = variants
+			self.animations[name].frames = [frame[None].image for frame in variants] # keeps the animation position
 
 	@property
 	def rect(self):
 		return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
 	
 	def reset(self):
-		self.y = float(constants.GROUND_Y() - constants.PLAYER_SIZE())
+		self.y = self.prev_y = float(constants.GROUND_Y() - constants.PLAYER_SIZE())
 		self.vy = 0.0
 		self.on_ground = True
 		self.recently_landed = False
 		self.state = "idle"
 	
+	def relayout(self, old: constants.Metrics):
+		# rescale frames in place (animation state is kept) and keep the height above ground proportional
+		m = constants.metrics()
+		ratio = m.sprite_scale / old.sprite_scale
+		size = m.player_size
+		self._build_frames(size)
+		height_above_ground = (old.ground_y - self.height) - self.y
+		self.width = size
+		self.height = size
+		self.x = m.player_x
+		self.y = self.prev_y = float(m.ground_y - self.height) - height_above_ground * ratio
+		self.vy *= ratio
+
 	def try_jump(self):
 		if self.on_ground:
 			self.vy = constants.JUMP_VELOCITY()
 			self.on_ground = False
 			self.state = "jump"
+			self.animations["jump"].restart()
 			self.land_time_remaining = 0.0
 	
+	def squash(self):
+		# which variant to show: stretched while rising fast, squashed the frame it lands
+		if self.vy < -50 * constants.SPRITE_SCALE():
+			return "stretch"
+		if self.on_ground and self.recently_landed:
+			return "squash"
+		return None
+
+	def frame(self):
+		# the current sprites.MaskedFrame and where it sits relative to (x, y) (anchored bottom left)
+		frame = self.frames[self.state][self.animations[self.state].index][self.squash()]
+		return frame, (0, int(self.height) - frame.image.get_height())
+
 	def get_mask(self):
-		# get the current frame surface from the AnimatedSprite
-		img = self.animations[self.state].get_image()
-		if img is None:
-			return None
-		key = id(img)
-		mask = self._mask_cache.get(key)
-		if mask is None:
-			mask = pygame.mask.from_surface(img)
-			self._mask_cache[key] = mask
-		return mask
+		return self.frame()[0].mask
 	
 	def update(self, dt):
-		self.vy += constants.GRAVITY() * dt
+		m = constants.metrics()
+		self.prev_y = self.y
+		self.vy += m.gravity * dt
 		self.y += self.vy * dt
-		ground_y = constants.GROUND_Y() - self.height
+		ground_y = m.ground_y - self.height
 		if self.y >= ground_y:
 			if not self.on_ground:
 				self.recently_landed = True
@@ -83,12 +129,11 @@ class Player: # player
 			self.on_ground = True
 			if self.recently_landed:
 				self.state = "land"
+				self.animations["land"].restart()
 				self.land_time_remaining = self.anim_durations.get("land", 0.25)
 		else:
 			self.on_ground = False
 
-		self.animations[self.state].update(dt) # animation update
-
 		if self.state == "land":
 			# decrement timer
 			self.land_time_remaining -= dt
@@ -100,38 +145,63 @@ class Player: # player
 			# clear flag after one update so land animation can play briefly
 			self.recently_landed = False
 
-	def draw(self, surf, scale_x = 1.0, scale_y = 1.0):
-		img = self.animations[self.state].get_image()
-		# img already scaled to constants.PLAYER_SIZE()/constants.PLAYER_SIZE(); apply micro squash/stretch via transform
-		w,h = img.get_size()
-		sw = max(1, int(w * scale_x))
-		sh = max(1, int(h * scale_y))
-		img_scaled = pygame.transform.scale(img, (sw, sh))
-		draw_x = int(self.x) # anchor bottom left
-		draw_y = int(self.y + (h - sh))
-		surf.blit(img_scaled, (draw_x, draw_y))
+	def draw(self, surf):
+		frame, (dx, dy) = self.frame()
+		surf.blit(frame.image, (int(self.x) + dx, int(self.y) + dy))
+
+# scaled obstacle sprites with their masks, shared by every obstacle (prepared by the game on load/resize)
+obstacle_frames = sprites.ScaledFrames()
 
 class Obstacle:
-	def __init__(self, x, sprite):
-		# sprite is native 24x24; scale to OBS_SIZE()/OBS_SIZE()
-		self.x = x
-		self.sprite = pygame.transform.scale(sprite, (constants.OBS_SIZE(), constants.OBS_SIZE()))
+	__slots__ = ("x", "prev_x", "y", "native_sprite", "frame", "sprite", "width", "height", "passed", "_rect")
+
+	def __init__(self, x = 0.0, sprite = None, lift = None):
+		self._rect = pygame.Rect(0, 0, 0, 0)
+		if sprite is not None:
+			self.spawn(x, sprite, lift)
+
+	def spawn(self, x, sprite, lift = None):
+		# (re)initialise in place, so pooled obstacles are reused rather than rebuilt
+		# sprite is native 24x24; drawn at OBS_SIZE()/OBS_SIZE() from obstacle_frames
+		m = constants.metrics()
+		self.x = self.prev_x = x # prev_x: where the last update started (collision sweeps from here)
+		self.native_sprite = sprite
+		self.frame = obstacle_frames.get(sprite, (m.obs_size, m.obs_size))
+		self.sprite = self.frame.image
 		self.width = self.sprite.get_width()
 		self.height = self.sprite.get_height()
-		self.y = constants.GROUND_Y() - self.height
-		if random.random() < 0.25: # random vertical offset for variety (floating obstacles)
-			self.y -= random.choice([24 * constants.SPRITE_SCALE(), 40 * constants.SPRITE_SCALE()])
+		# lift: native px above the ground (charts set it, otherwise it's random)
+		if lift is None:
+			lift = 0
+			if random.random() < 0.25: # random vertical offset for variety (floating obstacles)
+				lift = random.choice([constants.OBSTACLE_LIFTS["low"], constants.OBSTACLE_LIFTS["high"]])
+		self.y = m.ground_y - self.height - lift * m.sprite_scale
 		self.passed = False
 
-		# create a mask from the scaled surface for pixel-perfect collision
-		self.mask = pygame.mask.from_surface(self.sprite)
-
 	@property
 	def rect(self):
-		return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
+		# one Rect per obstacle, updated in place (copy it to keep it past the next read)
+		self._rect.update(int(self.x), int(self.y), self.width, self.height)
+		return self._rect
 	
-	def update(self, dt):
-		self.x -= constants.OBSTACLE_SPEED() * dt
+	def relayout(self, old: constants.Metrics):
+		# keep relative horizontal position and height above ground
+		m = constants.metrics()
+		ratio = m.sprite_scale / old.sprite_scale
+		height_above_ground = (old.ground_y - self.height) - self.y
+		self.x = self.prev_x = self.x * m.window_width / old.window_width
+		self.frame = obstacle_frames.get(self.native_sprite, (m.obs_size, m.obs_size))
+		self.sprite = self.frame.image
+		self.width = self.sprite.get_width()
+		self.height = self.sprite.get_height()
+		self.y = m.ground_y - self.height - height_above_ground * ratio
+
+	def update(self, dt, speed = None):
+		# callers updating many obstacles pass the speed in from their metrics snapshot
+		if speed is None:
+			speed = constants.metrics().obstacle_speed
+		self.prev_x = self.x
+		self.x -= speed * dt
 	
 	def draw(self, surf):
 		surf.blit(self.sprite, (int(self.x), int(self.y)))
@@ -139,17 +209,69 @@ class Obstacle:
 	def offscreen(self):
 		return self.x + self.width < 0
 
+class ObstaclePool:
+	"""
+	A fixed ring of reusable obstacles. Obstacles spawn at the right and all move left at the
+	same speed, so the ring is always in x order (oldest and leftmost first) and the ones that
+	have left the screen are always the oldest: recycling them only moves the head.
+	"""
+	def __init__(self, capacity: int = constants.OBSTACLE_POOL_SIZE):
+		self.slots = [Obstacle() for _ in range(capacity)]
+		self.head = 0 # slot of the oldest live obstacle
+		self.count = 0
+
+	def __len__(self):
+		return self.count
+
+	def __iter__(self):
+		slots, capacity = self.slots, len(self.slots)
+		for i in range(self.count):
+			yield slots[(self.head + i) % capacity]
+
+	def spawn(self, x, sprite, lift = None) -> Obstacle:
+		capacity = len(self.slots)
+		if self.count == capacity:
+			# full: the oldest (leftmost) one makes room
+			log.debug("Obstacle pool full (%d), recycling the oldest early", capacity)
+			self.head = (self.head + 1) % capacity
+			self.count -= 1
+		obs = self.slots[(self.head + self.count) % capacity]
+		obs.spawn(x, sprite, lift)
+		self.count += 1
+		return obs
+
+	def recycle_passed(self):
+		capacity = len(self.slots)
+		while self.count and self.slots[self.head].offscreen():
+			self.head = (self.head + 1) % capacity
+			self.count -= 1
+
+	def clear(self):
+		self.head = 0
+		self.count = 0
+
 class Mascot:
 	def __init__(self, sheet: sprites.SpriteSheet, font_small, theme):
-		# load native frames and scale to constants.MASCOT_SIZE()
-		sheet_count = 2 if theme == "dinosaur" else 3
-		native_frames = sheet.load_strip((0,0,constants.NATIVE_MASCOT,constants.NATIVE_MASCOT), sheet_count)
-		scaled = [pygame.transform.scale(f, (constants.MASCOT_SIZE(),constants.MASCOT_SIZE())) for f in native_frames]
-		self.anim = sprites.AnimatedSprite(scaled, fps=3) # slower default fps so it doesn't animate too fast
+		self.anim = None
+		self.set_sheet(sheet, theme)
 		self.x = int(constants.WINDOW_WIDTH() * 0.02)
 		self.y = int(constants.WINDOW_HEIGHT() * 0.02)
 		self.font_small = font_small
 
+	def set_sheet(self, sheet: sprites.SpriteSheet, theme):
+		# load native frames and scale to constants.MASCOT_SIZE()
+		sheet_count = 2 if theme == "dinosaur" else 3
+		self.native_frames = sheet.load_strip((0,0,constants.NATIVE_MASCOT,constants.NATIVE_MASCOT), sheet_count)
+		scaled = [pygame.transform.scale(f, (constants.MASCOT_SIZE(),constants.MASCOT_SIZE())) for f in self.native_frames]
+		if self.anim is None:
+			self.anim = sprites.AnimatedSprite(scaled, fps=3) # slower default fps so it doesn't animate too fast
+		else:
+			self.anim.frames = scaled # the frame index wraps to the new frame count by itself
+
+	def relayout(self):
+		size = constants.MASCOT_SIZE()
+		self.anim.frames = [pygame.transform.scale(f, (size, size)) for f in self.native_frames]
+
 	def react(self, mood):
 		# mood: "happy", "sad", "idle"
 		if mood == "happy":
@@ -159,9 +281,6 @@ class Mascot:
 		else:
 			self.anim.fps = 3
 	
-	def update(self, dt):
-		self.anim.update(dt)
-	
 	def draw(self, surf, x = None, y = None, size = None):
 		img = self.anim.get_image()
 		if size and (img.get_width() != size or img.get_height() != size):
@@ -178,28 +297,28 @@ class TitleScreen:
 		self.font_small = game.font_small
 		self.font_large = game.font_large
 		self.bg_layers = getattr(game, "bg_layers", [])
-		self.mascot = game.mascot
 
-		# load logo if present
+		# load logo if present (the common asset pack carries a copy)
 		self.logo = None
-		if os.path.exists(constants.TITLE_LOGO):
+		self.logo_native = None
+		packed = pack.open_common()
+		logo = packed.image("logo") if packed is not None else None
+		if logo is not None:
+			self.logo_native = logo.convert_alpha()
+		elif os.path.exists(constants.TITLE_LOGO):
 			try:
-				logo_img = pygame.image.load(constants.TITLE_LOGO).convert_alpha()
-				target_w = lambda: int(constants.WINDOW_WIDTH() * 0.3)
-				scale = target_w() / logo_img.get_width()
-				target_h = int(logo_img.get_height() * scale)
-				self.logo = pygame.transform.smoothscale(logo_img, (target_w(), target_h))
+				self.logo_native = sprites.images.load(constants.TITLE_LOGO)
 			except Exception:
-				self.logo = None
+				self.logo_native = None
+		self._scale_logo()
 
 		# load music if present
 		self.enter_title_music()
 
-		# UI buttons
-		self.menu_buttons = []
+		# UI buttons (built once; relayout only moves them so focus is kept)
+		self.menu = ui.ButtonStack()
 		self._create_menu_buttons()
-
-		self.press_text_y = lambda: int(constants.WINDOW_HEIGHT() * 0.88)
+		self.menu_buttons = self.menu.buttons
 
 		# pulse for 'press key'
 		self.pulse = 0.0
@@ -208,83 +327,63 @@ class TitleScreen:
 		# ambient particles
 		self.particles = particles.ParticleSystem(200)
 
-		# initial keyboard focus on first button
-		if self.menu_buttons:
-			self.menu_buttons[0].focus = True
+		self.relayout()
+
+	def _scale_logo(self):
+		if self.logo_native is None:
+			self.logo = None
+			return
+		target_w = int(constants.WINDOW_WIDTH() * 0.3)
+		scale = target_w / self.logo_native.get_width()
+		target_h = int(self.logo_native.get_height() * scale)
+		self.logo = pygame.transform.smoothscale(self.logo_native, (target_w, target_h))
+
+	def relayout(self):
+		m = constants.metrics()
+		self._scale_logo()
+
+		# menu: size and positions
+		btn_w = int(m.window_width * 0.28)
+		btn_h = max(48, int(m.window_height * 0.07))
+		base_y = int(m.window_height * 0.48)
+		gap = int(m.window_height * 0.02)
+		self.menu.layout(m.window_width // 2, base_y, btn_w, btn_h, gap, self.font_large())
+
+		# static overlays
+		self.dim = pygame.Surface((m.window_width, m.window_height), pygame.SRCALPHA)
+		self.dim.fill((10, 10, 12, 180))
+		self.press_text = self.font_small().render("Press Enter or Space to select", True, constants.TEXT_COLOUR)
+		self.title_text = self.font_large().render(constants.NAME, True, constants.TEXT_COLOUR)
 
 	def enter_title_music(self):
 		if os.path.exists(constants.TITLE_MUSIC):
-			try:
-				pygame.mixer.music.load(constants.TITLE_MUSIC)
+			# through the audio manager, so it knows the game track is no longer loaded
+			self.game.audio.load_music(constants.TITLE_MUSIC)
+			if self.game.audio.music_loaded:
 				pygame.mixer.music.set_volume(0.32)
-				pygame.mixer.music.play(-1)
-				self.title_music_loaded = True
-			except Exception:
-				self.title_music_loaded = False
+				self.game.audio.play_music(-1)
+			self.title_music_loaded = self.game.audio.music_loaded
 	
 	def _create_menu_buttons(self):
-		# compute size and positions
-		btn_w = lambda: int(constants.WINDOW_WIDTH() * 0.28)
-		btn_h = lambda: max(48, int(constants.WINDOW_HEIGHT() * 0.07))
-		centre_x = lambda: constants.WINDOW_WIDTH() // 2
-		base_y = lambda: int(constants.WINDOW_HEIGHT() * 0.48)
-		spacing = lambda: btn_h() + int(constants.WINDOW_HEIGHT() * 0.02)
-
-		def make_btn(text, idx, cb):
-			rect = (centre_x() - btn_w() // 2, base_y() + idx * spacing(), btn_w(), btn_h())
-			b = ui.Button(rect, text, self.font_large(), cb)
-			return b
-		
-		self.menu_buttons.clear()
-		self.menu_buttons.append(make_btn("Start", 0, helpers._with_click_sfx(lambda b: self.open_song_select(), self.game.audio)))
-		self.menu_buttons.append(make_btn("Settings", 1, helpers._with_click_sfx(lambda b: self.game.set_state("options"), self.game.audio)))
-		self.menu_buttons.append(make_btn("Quit", 2, lambda b: setattr(self.game, "running", False)))
+		# rects are set by relayout
+		def make_btn(text, cb):
+			return self.menu.add(ui.Button((0, 0, 0, 0), text, self.font_large(), cb))
+
+		make_btn("Start", helpers._with_click_sfx(lambda b: self.open_song_select(), self.game.audio))
+		make_btn("Settings", helpers._with_click_sfx(lambda b: self.game.set_state("options"), self.game.audio))
+		make_btn("Quit", lambda b: setattr(self.game, "running", False))
 	
 	def open_song_select(self):
 		self.game.set_state("song_select")
-	
-	def _focus_next(self):
-		if not self.menu_buttons:
-			return
-		idx = next((i for i, b in enumerate(self.menu_buttons) if b.focus), -1)
-		if idx >= 0:
-			self.menu_buttons[idx].focus = False
-		idx = (idx + 1) % len(self.menu_buttons)
-		self.menu_buttons[idx].focus = True
-	
-	def _focus_prev(self):
-		if not self.menu_buttons:
-			return
-		idx = next((i for i, b in enumerate(self.menu_buttons) if b.focus), -1)
-		if idx >= 0:
-			self.menu_buttons[idx].focus = False
-		idx = (idx - 1) % len(self.menu_buttons)
-		self.menu_buttons[idx].focus = True
 
 	def handle_input(self, events):
+		# buttons handle hover and clicks; the stack handles up/down focus
 		for e in events:
-			for b in self.menu_buttons:
-				if b.handle_event(e):
-					return
-
-		for e in events:
-			if e.type == pygame.KEYDOWN:
-				if e.key == pygame.K_UP:
-					self._focus_prev()
-				elif e.key == pygame.K_DOWN:
-					self._focus_next()
-				elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
-					focused = next((b for b in self.menu_buttons if b.focus), None)
-					if focused:
-						focused._click()
-				elif e.key == pygame.K_q:
-					pass
-			elif e.type == pygame.MOUSEMOTION:
-				# update hover states so buttons show hover visuals
-				for b in self.menu_buttons:
-					b.hover = b.rect.collidepoint(e.pos)
+			if self.menu.handle_event(e):
+				return
 	
 	def update(self, dt):
+		m = constants.metrics()
 		# pulse animation
 		self.pulse += dt * 2.0 * self.pulse_dir
 		if self.pulse > 1.0:
@@ -296,14 +395,13 @@ class TitleScreen:
 		
 		# ambient particles
 		if random.random() < 0.02:
-			x = lambda: random.uniform(constants.WINDOW_WIDTH()*0.2, constants.WINDOW_WIDTH()*0.8)
-			y = lambda: random.uniform(constants.WINDOW_HEIGHT()*0.2, constants.WINDOW_HEIGHT()*0.6)
-			self.particles.emit(x(),y(), count=4, colour=(255,240,200))
+			x = random.uniform(m.window_width*0.2, m.window_width*0.8)
+			y = random.uniform(m.window_height*0.2, m.window_height*0.6)
+			self.particles.emit(x, y, count=4, colour=(255,240,200))
 		self.particles.update(dt)
-		self.mascot.update(dt)
-		self._create_menu_buttons()
 
 	def draw(self):
+		m = constants.metrics()
 		surf = self.screen
 		surf.fill(constants.BACKGROUND_COLOUR)
 
@@ -313,29 +411,23 @@ class TitleScreen:
 				layer.draw(surf)
 
 		# dim background to focus UI
-		dim = pygame.Surface((constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()), pygame.SRCALPHA)
-		dim.fill((10, 10, 12, 180))
-		surf.blit(dim, (0, 0))
+		surf.blit(self.dim, (0, 0))
 		
 		# logo or fallback text (because i haven't designed logo yet)
 		if self.logo:
-			logo_x = lambda: constants.WINDOW_WIDTH() // 2 - self.logo.get_width() // 2
-			logo_y = lambda: int(constants.WINDOW_HEIGHT() * 0.15)
-			surf.blit(self.logo, (logo_x(), logo_y()))
+			logo_x = m.window_width // 2 - self.logo.get_width() // 2
+			logo_y = int(m.window_height * 0.15)
+			surf.blit(self.logo, (logo_x, logo_y))
 		else:
-			title_text = self.font_large().render(constants.NAME, True, constants.TEXT_COLOUR)
-			surf.blit(title_text, (constants.WINDOW_WIDTH()//2 - title_text.get_width()//2, int(constants.WINDOW_HEIGHT() * 0.10)))
+			surf.blit(self.title_text, (m.window_width//2 - self.title_text.get_width()//2, int(m.window_height * 0.10)))
 
 		# menu
-		for b in self.menu_buttons:
-			b.draw(surf)
+		self.menu.draw(surf)
 		
 		# press key text (pulsing alpha)
-		press_text = self.font_small().render("Press Enter or Space to select", True, constants.TEXT_COLOUR)
 		alpha = int(160 + 95 * self.pulse)
-		press_surf = press_text.copy()
-		press_surf.set_alpha(alpha)
-		surf.blit(press_surf, (constants.WINDOW_WIDTH()//2 - press_text.get_width()//2, self.press_text_y()))
+		self.press_text.set_alpha(alpha)
+		surf.blit(self.press_text, (m.window_width//2 - self.press_text.get_width()//2, int(m.window_height * 0.88)))
 
 		# particles
 		self.particles.draw(surf)
@@ -348,48 +440,77 @@ class SongSelectScreen:
 		self.font_large = game.font_large
 		self.tracks = game.available_tracks
 
-		self.panel_x = int(constants.WINDOW_WIDTH() * 0.08)
-		self.panel_y = int(constants.WINDOW_HEIGHT() * 0.12)
-		self.panel_w = int(constants.WINDOW_WIDTH() * 0.84)
-		self.panel_h = int(constants.WINDOW_HEIGHT() * 0.76)
-
-		self.visible_top = self.panel_y + int(self.panel_h * 0.18)
-		self.visible_h = int(self.panel_h * 0.72)
-		self.visible_bottom = self.visible_top + self.visible_h
-
 		self.scroll_y = 0
 		self.max_scroll = 0
-		self.tile_h = max(80, int(constants.WINDOW_HEIGHT() * 0.12))
-		self.spacing = self.tile_h + int(constants.WINDOW_HEIGHT() * 0.03)
+		self.art = {}
 
 		# build tiles from constants.TRACKS constant
 		self.tiles = []
-		self.selected_index = 0
+		self.focus_manager = ui.FocusManager()
+		self.dispatcher = ui.Dispatcher(self.focus_manager, scroll=lambda: self.scroll_y)
 		self._build_tiles()
 
+		self.relayout()
+
+	@property
+	def selected_index(self):
+		return self.focus_manager.index
+
+	def relayout(self):
+		m = constants.metrics()
+		self.panel_x = int(m.window_width * 0.08)
+		self.panel_y = int(m.window_height * 0.12)
+		self.panel_w = int(m.window_width * 0.84)
+		self.panel_h = int(m.window_height * 0.76)
+
+		self.visible_top = self.panel_y + int(self.panel_h * 0.18)
+		self.visible_h = int(self.panel_h * 0.72)
+		self.visible_bottom = self.visible_top + self.visible_h
+
+		self.tile_h = max(80, int(m.window_height * 0.12))
+		self.spacing = self.tile_h + int(m.window_height * 0.03)
+
+		# tile layout: horizontal stretching tiles stacked vertically
+		tile_w = int(m.window_width * 0.7)
+		margin_x = int(m.window_width * 0.15)
+		base_y = int(m.window_height * 0.28)
+
+		# tiles are hit-tested by their unscrolled rects, only inside the visible area
+		self.dispatcher.clear()
+		self.dispatcher.viewport = pygame.Rect(self.panel_x, self.visible_top, self.panel_w, self.visible_h)
+		for i, (btn, _) in enumerate(self.tiles):
+			btn.base_rect = pygame.Rect(margin_x, base_y + i * self.spacing, tile_w, self.tile_h)
+			btn.rect = btn.base_rect.move(0, -self.scroll_y)
+			btn.font = self.font_large()
+			self.dispatcher.add(btn, btn.base_rect, scrolled=True)
+
 		self._compute_max_scroll()
-	
+		self.scroll_y = min(self.scroll_y, self.max_scroll)
+
+	def _art(self, path):
+		# album art is loaded once per screen (None if missing or unreadable)
+		if path not in self.art:
+			img = None
+			if os.path.exists(path):
+				try:
+					img = sprites.images.load(path)
+				except Exception:
+					img = None
+			self.art[path] = img
+		return self.art[path]
+
 	def _build_tiles(self):
-		# tile layout: horizontal stretching tiles stacked vertically
-		tile_w = int(constants.WINDOW_WIDTH() * 0.7)
-		tile_h = max(80, int(constants.WINDOW_HEIGHT() * 0.12))
-		margin_x = int(constants.WINDOW_WIDTH() * 0.15)
-		base_y = int(constants.WINDOW_HEIGHT() * 0.28)
-		spacing = tile_h + int(constants.WINDOW_HEIGHT() * 0.03)
-
-		for i, t in enumerate(constants.TRACKS):
-			rect = pygame.Rect(margin_x, base_y + i * spacing, tile_w, tile_h)
+		for t in constants.TRACKS:
 			btn = ui.Button(
-				rect,
+				(0, 0, 0, 0),
 				"",
 				self.font_large(),
 				lambda b, track=t: self._select_track(track),
 				radius=12
 			)
-			btn.base_rect = rect.copy()
+			btn.base_rect = btn.rect.copy()
 			self.tiles.append((btn, t))
-		
-		self._apply_focus()
+			self.focus_manager.add(btn)
 
 	def _compute_max_scroll(self):
 		total_h = len(self.tiles) * self.spacing
@@ -404,9 +525,8 @@ class SongSelectScreen:
 		try: self.game.audio.play_sfx("ui_decide_title")
 		except: pass
 
-		# start music and go to playing
-		self.game.start_track(self.game.current_track)
-		self.game.set_state("playing")
+		# start music and go to playing (once the gameplay assets are loaded)
+		self.game.play_track(self.game.current_track)
 	
 	def _ensure_selected_visible(self):
 		# compute selected tile y and adjust scroll_y to bring it into view
@@ -418,31 +538,19 @@ class SongSelectScreen:
 		elif bottom > self.scroll_y + self.visible_h:
 			self.scroll_y = min(self.max_scroll, bottom - self.visible_h)
 
-	def _apply_focus(self):
-		for i, (btn, _) in enumerate (self.tiles):
-			btn.focus = (i == self.selected_index)
-
 	def handle_input(self, events):
 		for e in events:
-			if e.type == pygame.MOUSEBUTTONDOWN:
+			if e.type == pygame.MOUSEBUTTONDOWN and e.button in (4, 5):
 				if e.button == 4: # wheel up
 					self.scroll_y = max(0, self.scroll_y - int(self.tile_h * 0.5))
-				elif e.button == 5: # wheel down
+				else: # wheel down
 					self.scroll_y = min(self.max_scroll, self.scroll_y + int(self.tile_h * 0.5))
-				elif e.button == 1: # left click
-					# check click against scrolled tile rects
-					for i, (btn, track) in enumerate(self.tiles):
-						hit_rect = btn.base_rect.move(0, -self.scroll_y)
-						if hit_rect.collidepoint(e.pos):
-							self._select_track(track)
 			elif e.type == pygame.KEYDOWN:
 				if e.key == pygame.K_UP:
-					self.selected_index = max(0, self.selected_index - 1)
-					self._apply_focus()
+					self.focus_manager.prev()
 					self._ensure_selected_visible()
 				elif e.key == pygame.K_DOWN:
-					self.selected_index = min(len(self.tiles) - 1, self.selected_index + 1)
-					self._apply_focus()
+					self.focus_manager.next()
 					self._ensure_selected_visible()
 				elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
 					btn, track = self.tiles[self.selected_index]
@@ -451,19 +559,19 @@ class SongSelectScreen:
 				elif e.key in (pygame.K_ESCAPE, pygame.K_q):
 					self.game.set_state("title")
 					return
-			elif e.type == pygame.MOUSEMOTION:
-				# update hover states so buttons show hover visuals
-				for b, t in self.tiles:
-					b.hover = b.rect.collidepoint(e.pos)
+			elif self.dispatcher.dispatch(e):
+				# a tile was clicked (its on_click selects the track)
+				return
 	
 	def draw(self):
+		m = constants.metrics()
 		surf = self.screen
 		surf.fill((20, 20, 24))
 
-		panel_x = int(constants.WINDOW_WIDTH() * 0.08)
-		panel_y = int(constants.WINDOW_HEIGHT() * 0.12)
-		panel_w = int(constants.WINDOW_WIDTH() * 0.84)
-		panel_h = int(constants.WINDOW_HEIGHT() * 0.76)
+		panel_x = int(m.window_width * 0.08)
+		panel_y = int(m.window_height * 0.12)
+		panel_w = int(m.window_width * 0.84)
+		panel_h = int(m.window_height * 0.76)
 		panel_rect = pygame.Rect(panel_x, panel_y, panel_w, panel_h)
 
 		ui.draw_panel(
@@ -476,10 +584,10 @@ class SongSelectScreen:
 		)
 
 		title = self.font_large().render("Choose a Song", True, constants.TEXT_COLOUR)
-		surf.blit(title, (constants.WINDOW_WIDTH()//2 - title.get_width()//2, panel_y + 12))
+		surf.blit(title, (m.window_width//2 - title.get_width()//2, panel_y + 12))
 
 		subtitle = self.font_small().render("Select a track to begin playing", True, (180,170,160))
-		surf.blit(subtitle, (constants.WINDOW_WIDTH()//2 - subtitle.get_width()//2,
+		surf.blit(subtitle, (m.window_width//2 - subtitle.get_width()//2,
 					   		panel_y + 12 + title.get_height() + 4))
 		
 		visible_top = panel_y + int(panel_h * 0.18)
@@ -507,12 +615,9 @@ class SongSelectScreen:
 			art_size = draw_rect.height - pad * 2
 			art_rect = pygame.Rect(draw_rect.x + pad, draw_rect.y + pad, art_size, art_size)
 
-			if os.path.exists(art_path):
-				try:
-					img = pygame.image.load(art_path).convert_alpha()
-					helpers._draw_rounded_image(surf, img, art_rect, radius=12)
-				except:
-					pass
+			img = self._art(art_path)
+			if img is not None:
+				helpers._draw_rounded_image(surf, img, art_rect, radius=12)
 
 			# text positions
 			text_x = art_rect.right + pad
@@ -536,91 +641,148 @@ class SettingsScreen:
 		self.font_large = game.font_large
 		self.settings = game.settings
 
-		# layout
-		self.panel_x = int(constants.WINDOW_WIDTH() * 0.08)
-		self.panel_y = int(constants.WINDOW_HEIGHT() * 0.12)
-		self.panel_w = int(constants.WINDOW_WIDTH() * 0.84)
-		self.panel_h = int(constants.WINDOW_HEIGHT() * 0.76)
-
-		# reset button
-		btn_w = 40 * constants.SPRITE_SCALE()
-		btn_h = 40
+		# reset button (rect is filled in by relayout)
 		self.reset_button = ui.Button(
-			(self.panel_x + self.panel_w - btn_w - 12,
-			self.panel_y + 12,
-			btn_w,
-			btn_h),
+			(0, 0, 0, 0),
 			"Reset",
 			self.font_small(),
 			helpers._with_click_sfx(lambda b: self._reset_settings(), self.game.audio),
 			radius=8
 		)
 
-		# visible scroll area inside panel
-		self.visible_top = self.panel_y + int(self.panel_h * 0.22)
-		self.visible_h = int(self.panel_h * 0.72)
-		self.visible_bottom = self.visible_top + self.visible_h
-
-		# tile geometry
-		self.tile_h = max(80, int(constants.WINDOW_HEIGHT() * 0.12))
-		self.spacing = self.tile_h + int(constants.WINDOW_HEIGHT() * 0.03)
-		self.tile_w = int(self.panel_w * 0.90)
-		self.margin_x = self.panel_x + int(self.panel_w * 0.05)
-		self.base_y = self.visible_top
-
 		# key, label, description, control type, control args
 		self.schema = [
 			("theme", "App theme", "Choose the app's theme", "input", {}),
+			("audio_latency", "Audio Latency", "Low, Balanced or Safe (on next launch)", "input", {"placeholder": constants.AUDIO_LATENCY}),
 			("beat_sound", "Beat Sound", "Play a sound on every beat", "toggle", {}),
 			("debug", "Debug UI", "Show debug overlay and FPS", "toggle", {}),
 			("music_latency", "Music Latency", "Adjust audio timing (seconds)", "slider", {"min": -1.0, "max": 1.0, "step": 0.01}),
+			("calibrate", "Calibrate Latency", "Tap along to a click to set Music Latency", "button", {"text": "Start", "state": "calibrate"}),
 			("master_volume", "Master Volume", "Overall music volume", "slider", {"min": 0.0, "max": 1.0, "step": 0.01}),
 			("idle", "Idle Player Mode", "Play the game automatically", "toggle", {}),
 			("intro", "Song Intro", "Count in to the song's main melody", "toggle", {})
 		]
 
 		self.tiles = []
-		for i, (key, label, desc, ctype, args) in enumerate(self.schema):
-			base_rect = pygame.Rect(self.margin_x, self.base_y + i * self.spacing, self.tile_w, self.tile_h)
+		for key, label, desc, ctype, args in self.schema:
+			base_rect = pygame.Rect(0, 0, 0, 0)
 			if ctype == "toggle":
-				ctrl_rect = (0, 0, 30 * constants.SPRITE_SCALE(), 15 * constants.SPRITE_SCALE())
-				ctrl = ui.ToggleSwitch(ctrl_rect, value=self.settings.get(key), font=self.font_small)
+				ctrl = ui.ToggleSwitch((0, 0, 0, 0), value=self.settings.get(key), font=self.font_small)
 				# bind on_change to persist
 				ctrl.on_change = (lambda k: helpers._with_click_sfx(lambda v: self._on_change(k, v), self.game.audio))(key)
 			elif ctype == "slider":
-				ctrl_rect = (0, 0, 80 * constants.SPRITE_SCALE(), 9 * constants.SPRITE_SCALE())
 				minv = args.get("min", 0.0)
 				maxv = args.get("max", 1.0)
-				ctrl = ui.Slider(ctrl_rect, minv=minv, maxv=maxv, value=self.settings.get(key))
+				ctrl = ui.Slider((0, 0, 0, 0), minv=minv, maxv=maxv, value=self.settings.get(key))
 				ctrl.on_change = (lambda k: (lambda v: self._on_change(k, v)))(key)
 			elif ctype == "input":
-				ctrl_rect = (0, 0, 70 * constants.SPRITE_SCALE(), 12 * constants.SPRITE_SCALE())
 				initial = str(self.settings.get(key))
-				ctrl = ui.TextInput(ctrl_rect, text=initial, font=self.game.font_small, placeholder=constants.DEFAULT_THEME)
+				ctrl = ui.TextInput((0, 0, 0, 0), text=initial, font=self.game.font_small, placeholder=args.get("placeholder", constants.DEFAULT_THEME))
 				ctrl.on_change = (lambda k: (lambda v: self._on_change(k, v)))(key)
+				ctrl.on_blur = (lambda k: (lambda: self._refresh_control(k)))(key) # shows what was kept
+			elif ctype == "button":
+				# opens another screen instead of holding a setting
+				ctrl = ui.Button((0, 0, 0, 0), args["text"], self.font_small(), (lambda state: helpers._with_click_sfx(lambda b: self.game.set_state(state), self.game.audio))(args["state"]), radius=8)
 			else:
 				ctrl = None
 
 			self.tiles.append((base_rect, label, desc, ctrl, key))
-		
+
+		# keyboard focus follows the selected tile; hovering a control selects it
+		self.focus_manager = ui.FocusManager([ctrl for _, _, _, ctrl, _ in self.tiles])
+		self.dispatcher = ui.Dispatcher(self.focus_manager, scroll=lambda: self.scroll_y)
+		self.dispatcher.on_hover = self.focus_manager.set
+
 		self.scroll_y = 0
+		self.relayout()
+
+	@property
+	def selected_index(self):
+		return self.focus_manager.index
+
+	def relayout(self):
+		m = constants.metrics()
+		# layout
+		self.panel_x = int(m.window_width * 0.08)
+		self.panel_y = int(m.window_height * 0.12)
+		self.panel_w = int(m.window_width * 0.84)
+		self.panel_h = int(m.window_height * 0.76)
+
+		# reset button
+		btn_w = 40 * m.sprite_scale
+		btn_h = 40
+		self.reset_button.rect = pygame.Rect(self.panel_x + self.panel_w - btn_w - 12, self.panel_y + 12, btn_w, btn_h)
+		self.reset_button.font = self.font_small()
+		self.reset_button._render_text()
+
+		# visible scroll area inside panel
+		self.visible_top = self.panel_y + int(self.panel_h * 0.22)
+		self.visible_h = int(self.panel_h * 0.72)
+		self.visible_bottom = self.visible_top + self.visible_h
+
+		# tile geometry
+		self.tile_h = max(80, int(m.window_height * 0.12))
+		self.spacing = self.tile_h + int(m.window_height * 0.03)
+		self.tile_w = int(self.panel_w * 0.90)
+		self.margin_x = self.panel_x + int(self.panel_w * 0.05)
+		self.base_y = self.visible_top
+
+		# controls are hit-tested by their unscrolled rects, only inside the visible area
+		self.dispatcher.clear()
+		self.dispatcher.viewport = pygame.Rect(self.panel_x, self.visible_top, self.panel_w, self.visible_h)
+		self.dispatcher.add(self.reset_button)
+
+		scale = m.sprite_scale
+		for i, (base_rect, _, _, ctrl, _) in enumerate(self.tiles):
+			base_rect.update(self.margin_x, self.base_y + i * self.spacing, self.tile_w, self.tile_h)
+			if isinstance(ctrl, ui.ToggleSwitch):
+				ctrl.rect.size = (30 * scale, 15 * scale)
+			elif isinstance(ctrl, ui.Slider):
+				ctrl.rect.size = (80 * scale, 9 * scale)
+			elif isinstance(ctrl, ui.TextInput):
+				ctrl.rect.size = (70 * scale, 12 * scale)
+			elif isinstance(ctrl, ui.Button):
+				ctrl.rect.size = (40 * scale, 12 * scale)
+				ctrl.font = self.font_small()
+				ctrl._render_text()
+			if ctrl:
+				self._place_control(ctrl, base_rect)
+				self.dispatcher.add(ctrl, scrolled=True)
+
 		total_height = len(self.tiles) * self.spacing
 		self.max_scroll = max(0, total_height - self.visible_h)
-
-		self.selected_index = 0
-		self._apply_focus()
+		self.scroll_y = min(self.scroll_y, self.max_scroll)
+
+	def _place_control(self, ctrl, tile_rect):
+		# right-aligned inside its tile, vertically centred
+		scale = constants.SPRITE_SCALE()
+		if isinstance(ctrl, ui.ToggleSwitch):
+			inset = 36 * scale
+		elif isinstance(ctrl, ui.Slider):
+			inset = 86 * scale
+		else:
+			inset = 74 * scale
+		ctrl.rect.topleft = (tile_rect.right - inset, tile_rect.y + (tile_rect.h - ctrl.rect.h)//2)
 
 	def _on_change(self, key, value):
 		# persist
 		self.settings.set(key, value)
 		# apply side effects
 		if key == "theme":
-			if value in ("Classic", "London", "Flagship", "Dinosaur"):
-				self.game.theme = str(value).lower()
-				self.game.restart_screen = "options"
-				self.game.restarting = True
+			if str(value).lower() in themes.available():
+				# swapped in between frames once the loader has it ready
+				self.game.request_theme(str(value).lower())
 			else:
 				self.settings.set(key, str(self.game.theme).capitalize())
+				self._refresh_control(key)
+		if key == "audio_latency":
+			# only a known preset is kept; the mixer picks it up on the next launch
+			preset = str(value).capitalize()
+			if preset in constants.AUDIO_LATENCY_PRESETS:
+				self.settings.set(key, preset)
+			else:
+				self.settings.set(key, self.game.audio_latency)
+				self._refresh_control(key)
 		if key == "master_volume":
 			try:
 				pygame.mixer.music.set_volume(float(value))
@@ -633,6 +795,7 @@ class SettingsScreen:
 				pass
 		if key == "debug":
 			self.game.debug = bool(value)
+			log.set_level(log.DEBUG if self.game.debug else log.INFO)
 		if key == "beat_sound":
 			self.game.beat_sound = bool(value)
 		if key == "idle":
@@ -640,11 +803,6 @@ class SettingsScreen:
 		if key == "intro":
 			self.game.intro = bool(value)
 	
-	def _apply_focus(self):
-		for i, (_, _, _, ctrl, _) in enumerate(self.tiles):
-			if ctrl:
-				ctrl.focus = (i == self.selected_index)
-	
 	def _ensure_selected_visible(self):
 		idx = self.selected_index
 		top = idx * self.spacing
@@ -661,65 +819,76 @@ class SettingsScreen:
 			self.settings.set(key, default)
 		
 		# reapply to game
-		self.game.theme = self.settings.get("theme").lower()
+		self.game.request_theme(self.settings.get("theme").lower())
 		self.game.music_latency = self.settings.get("music_latency")
 		self.game.debug = self.settings.get("debug")
+		log.set_level(log.DEBUG if self.game.debug else log.INFO)
 		self.game.beat_sound = self.settings.get("beat_sound")
 		self.game.idle = self.settings.get("idle")
 		self.game.intro = self.settings.get("intro")
 		pygame.mixer.music.set_volume(self.settings.get("master_volume"))
 
 		# update controls visually
-		for _, _, _, ctrl, key in self.tiles:
-			if ctrl:
+		for _, _, _, _, key in self.tiles:
+			self._refresh_control(key)
+
+	def _refresh_control(self, key):
+		# show the stored value on a setting's control (a text field being typed in catches up when it loses focus)
+		for _, _, _, ctrl, k in self.tiles:
+			if k != key:
+				continue
+			if isinstance(ctrl, ui.TextInput):
+				if ctrl.focus:
+					continue
+				ctrl.text = str(self.settings.get(key))
+				ctrl._clamp_cursor()
+			elif isinstance(ctrl, (ui.ToggleSwitch, ui.Slider)):
 				ctrl.value = self.settings.get(key)
 
-		self.game.restart_screen = "options"
-		self.game.restarting = True
+	def set_value(self, key, value):
+		# change a setting from outside the screen (applied like an edit, and shown on its control)
+		self._on_change(key, value)
+		self._refresh_control(key)
 	
 	def handle_input(self, events):
 		for e in events:
-			if self.reset_button.handle_event(e):
-				return
-
 			if e.type == pygame.KEYDOWN:
 				if e.key == pygame.K_ESCAPE:
 					self.game.set_state("title")
 					return
 				elif e.key == pygame.K_UP:
-					self.selected_index = max(0, self.selected_index - 1)
-					self._apply_focus()
+					self.focus_manager.prev()
 					self._ensure_selected_visible()
 					return
 				elif e.key == pygame.K_DOWN:
-					self.selected_index = min(len(self.tiles)-1, self.selected_index + 1)
-					self._apply_focus()
+					self.focus_manager.next()
 					self._ensure_selected_visible()
 					return
 				elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
-					_, _, _, ctrl, _ = self.tiles[self.selected_index]
+					ctrl = self.focus_manager.focused()
 					if isinstance(ctrl, ui.ToggleSwitch):
 						ctrl.toggle()
 					elif isinstance(ctrl, ui.Slider):
 						ctrl.focus = True
+					elif isinstance(ctrl, ui.Button):
+						ctrl._click()
 					return
-			elif e.type == pygame.MOUSEBUTTONDOWN:
+			elif e.type == pygame.MOUSEBUTTONDOWN and e.button in (4, 5):
 				if e.button == 4:
 					self.scroll_y = max(0, self.scroll_y - int(self.tile_h * 0.5))
-				elif e.button == 5:
+				else:
 					self.scroll_y = min(self.max_scroll, self.scroll_y + int(self.tile_h * 0.5))
-			elif e.type == pygame.MOUSEMOTION:
-				for base_rect, label, desc, ctrl, key in self.tiles:
-					ctrl.focus = ctrl.rect.collidepoint(e.pos)
-				
-			for base_rect, label, desc, ctrl, key in self.tiles:
-				if ctrl and ctrl.handle_event(e):
-					return
+				continue
+
+			# the focused control gets keys, the control under the pointer gets the mouse
+			if self.dispatcher.dispatch(e):
+				return
 
 	def update(self, dt):
 		pass
 
 	def draw(self):
+		m = constants.metrics()
 		surf = self.screen
 		surf.fill((18,18,20))
 
@@ -759,32 +928,181 @@ class SettingsScreen:
 
 			# control positioning
 			if ctrl:
-				if isinstance(ctrl, ui.ToggleSwitch):
-					ctrl.rect.topleft = (draw_rect.right - (36 * constants.SPRITE_SCALE()), draw_rect.y + (draw_rect.h - ctrl.rect.h)//2)
-				elif isinstance(ctrl, ui.Slider):
-					ctrl.rect.topleft = (draw_rect.right - (86 * constants.SPRITE_SCALE()), draw_rect.y + (draw_rect.h - ctrl.rect.h)//2)
-				elif isinstance(ctrl, ui.TextInput):
-					ctrl.rect.topleft = (draw_rect.right - (74 * constants.SPRITE_SCALE()), draw_rect.y + (draw_rect.h - ctrl.rect.h)//2)
+				self._place_control(ctrl, draw_rect)
 				ctrl.draw(surf)
 		surf.set_clip(prev_clip)
 
+class CalibrationScreen:
+	"""
+	Plays the metronome click track and collects taps to measure how late players hear (and
+	react to) the audio. The clicks are sample-accurate on a grid fixed at start(), so frame
+	timing doesn't skew the offsets. The mean offset of the steady taps becomes the
+	music_latency setting.
+	"""
+	def __init__(self, game):
+		self.game = game
+		self.screen = game.screen
+		self.font_small = game.font_small
+		self.font_large = game.font_large
+		self.interval_ms = 60000.0 / constants.CALIBRATION_BPM
+
+		# shown once a run finishes (rects are set by relayout)
+		self.menu = ui.ButtonStack(keys=(pygame.K_LEFT, pygame.K_RIGHT))
+		self.save_button = self.menu.add(ui.Button((0, 0, 0, 0), "Save", self.font_small(), helpers._with_click_sfx(lambda b: self.save(), game.audio), radius=8))
+		self.menu.add(ui.Button((0, 0, 0, 0), "Retry", self.font_small(), helpers._with_click_sfx(lambda b: self.start(), game.audio), radius=8))
+		self.menu.add(ui.Button((0, 0, 0, 0), "Back", self.font_small(), lambda b: game.set_state("options"), radius=8))
+
+		self._reset()
+		self.relayout()
+
+	def _reset(self):
+		self.start_ms = pygame.time.get_ticks() + self.interval_ms # click 0 (the grid origin)
+		self.next_click = 0
+		self.offsets = [] # seconds, tap minus click
+		self.tapped = set() # clicks that already have a tap
+		self.result = None # (mean, jitter, kept) from helpers.latency_stats
+		self.done = False
+		self.menu.focus_manager.set_index(0)
+
+	def start(self):
+		# clicks start one beat from now
+		self._reset()
+		self.game.audio.metronome.stop()
+		self.game.audio.metronome.start(constants.CALIBRATION_BPM, (pygame.time.get_ticks() - self.start_ms) / 1000.0)
+
+	def stop(self):
+		self.game.audio.metronome.stop()
+
+	def relayout(self):
+		m = constants.metrics()
+		self.panel = pygame.Rect(int(m.window_width * 0.2), int(m.window_height * 0.2), int(m.window_width * 0.6), int(m.window_height * 0.6))
+		btn_w = 48 * m.sprite_scale
+		btn_h = max(44, int(m.window_height * 0.06))
+		gap = 24
+		x = self.panel.centerx - (btn_w * 3 + gap * 2) // 2
+		for i, btn in enumerate(self.menu.buttons):
+			btn.rect = pygame.Rect(x + i * (btn_w + gap), self.panel.bottom - btn_h - int(self.panel.h * 0.08), btn_w, btn_h)
+			btn.font = self.font_small()
+			btn._render_text()
+		self.menu.reindex()
+
+	@property
+	def total_clicks(self):
+		return constants.CALIBRATION_WARMUP + constants.CALIBRATION_CLICKS
+
+	def _tap(self, ms):
+		# match the tap to its nearest click on the grid; one tap per click, none during warm-up
+		k = round((ms - self.start_ms) / self.interval_ms)
+		if k < constants.CALIBRATION_WARMUP or k >= self.total_clicks or k in self.tapped:
+			return
+		self.tapped.add(k)
+		self.offsets.append((ms - (self.start_ms + k * self.interval_ms)) / 1000.0)
+
+	def _finish(self):
+		self.done = True
+		self.stop()
+		self.result = helpers.latency_stats(self.offsets)
+		if self.result is not None and len(self.result[2]) < constants.CALIBRATION_MIN_TAPS:
+			self.result = None
+		self.save_button.enabled = self.result is not None
+		self.menu.focus_manager.set_index(0 if self.result is not None else 1)
+		if self.result is not None:
+			mean, jitter, kept = self.result
+			log.info("Calibration: offset %.1f ms, jitter %.1f ms (%d of %d taps kept)", mean * 1000, jitter * 1000, len(kept), len(self.offsets))
+
+	def save(self):
+		if self.result is None:
+			return
+		latency = round(max(-1.0, min(1.0, self.result[0])), 3) # the settings slider's range
+		self.game.settings_screen.set_value("music_latency", latency)
+		self.game.set_state("options")
+
+	def handle_input(self, events):
+		for e in events:
+			if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
+				self.game.set_state("options")
+				return
+			if self.done:
+				self.menu.handle_event(e)
+				continue
+			if e.type == pygame.KEYDOWN and e.key in (pygame.K_SPACE, pygame.K_RETURN, pygame.K_UP):
+				self._tap(gamepad.polled_ms)
+			elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+				self._tap(gamepad.polled_ms)
+			elif e.type == pygame.JOYBUTTONDOWN:
+				self._tap(gamepad.polled_ms)
+
+	def update(self, dt):
+		if self.done:
+			return
+		now = pygame.time.get_ticks()
+		self.next_click = max(0, int((now - self.start_ms) // self.interval_ms) + 1) # clicks heard so far
+		# leave half a beat after the last click for its tap (the click track stops before the next one)
+		if now >= self.start_ms + (self.total_clicks - 0.5) * self.interval_ms:
+			self._finish()
+
+	def draw(self):
+		surf = self.screen
+		surf.fill((18,18,20))
+		ui.draw_panel(surf, self.panel, (30,28,32), (80,70,60), subtitle="Press ESC to return", subtitle_font=self.font_small)
+
+		title = self.font_large().render("Latency Calibration", True, constants.TEXT_COLOUR)
+		surf.blit(title, (self.panel.centerx - title.get_width()//2, self.panel.y + 12))
+
+		if not self.done:
+			lines = ["Tap Space (or click) in time with the clicks"]
+			if self.next_click <= constants.CALIBRATION_WARMUP:
+				lines.append("Get ready...")
+			else:
+				lines.append(f"Taps {len(self.offsets)} / {constants.CALIBRATION_CLICKS}")
+		elif self.result is None:
+			lines = ["Not enough steady taps", "Try again and tap along with every click"]
+		else:
+			mean, jitter, kept = self.result
+			lines = [
+				f"You hear the beat {abs(mean) * 1000:.0f} ms {'late' if mean >= 0 else 'early'}",
+				f"Jitter {jitter * 1000:.0f} ms ({len(kept)} of {len(self.offsets)} taps used)",
+			]
+			if jitter > constants.BEAT_TOLERANCE_GOOD:
+				lines.append("Your taps were uneven, a retry may give a better result")
+
+		y = self.panel.y + 24 + title.get_height()
+		for i, text in enumerate(lines):
+			line = (self.font_large if i == 0 else self.font_small)().render(text, True, constants.TEXT_COLOUR if i == 0 else (180,170,160))
+			surf.blit(line, (self.panel.centerx - line.get_width()//2, y))
+			y += line.get_height() + 8
+
+		if self.done:
+			self.menu.draw(surf)
+
 # Helper classes
 
 class ParallaxLayer:
-	def __init__(self, path, speed):
-		self.image = pygame.image.load(path).convert_alpha()
+	def __init__(self, path, speed, image = None, night = None):
+		self.path = path if image is None else None # set while it holds a reference in sprites.images
+		self.image = image if image is not None else sprites.images.load(path)
 		self.speed = speed
 		self.offset = 0.0
+		self.night = night if night is not None else (True if path and "night" in path else False)
+		self.relayout()
+
+	def release(self):
+		if self.path is not None:
+			sprites.images.release(self.image)
+			self.path = None
+
+	def relayout(self):
+		# the window-sized copy is only rebuilt when the window size changes
 		self.w = constants.WINDOW_WIDTH()
-		self.night = True if "night" in path else False
+		self.scaled = pygame.transform.scale(self.image, (constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()))
+		self.offset %= self.w
 
 	def update(self, dt, camera_dx):
 		# camera_dx is in pixels per second; multiply by dt for per-frame offset
 		self.offset = (self.offset + camera_dx * self.speed * dt) % self.w
 
 	def draw(self, surf : pygame.Surface, alpha : int = None):
-		img = self.image.copy()
-		img = pygame.transform.scale(img, (constants.WINDOW_WIDTH(), constants.WINDOW_HEIGHT()))
+		img = self.scaled
 		if self.night:
 			img.set_alpha(alpha)
 		x = -int(self.offset)
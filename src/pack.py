@@ -0,0 +1,222 @@
+"""
+Compiled asset packs
+"""
+
+import json, mmap, os, struct, sys, threading, zlib, pygame
+import sprites, constants, log
+
+# layout: header | zlib-compressed blobs | JSON index
+# header: magic, version, index offset, index length
+HEADER = struct.Struct("<4sIQQ")
+MAGIC = b"CSPK"
+VERSION = 3
+LEVEL = 9 # compression is done once at build time; inflating is just as fast at any level
+PIXEL_FORMAT = "BGRA" # byte order of a 32-bit ARGB surface, the usual display format, so convert_alpha is a plain copy
+COMMON = "common" # the pack shared by every theme: sound effects and the title logo
+
+# horizontal strips stored already cut into frames: role -> (asset, frame size, fewest frames)
+STRIPS = {
+	"tiles": (constants.TILESET, constants.NATIVE_TILE, constants.MIN_TILES),
+	"obstacles": (constants.OBSTACLES, constants.NATIVE_OBS, 1),
+}
+
+_packs = {} # name -> Pack or None (missing/stale), opened once per process
+_lock = threading.Lock()
+
+def pack_path(name: str) -> str:
+	return os.path.join(constants.PACKS_DIR, f"{name}.pack")
+
+def open_theme(theme: str):
+	"""
+	The memory-mapped pack for a theme, or None if there is no usable one (missing, from an
+	older version or older than any of its source files). Callers fall back to loose files.
+	"""
+	with _lock:
+		if theme in _packs:
+			return _packs[theme]
+		path = pack_path(theme)
+		packed = None
+		if os.path.exists(path):
+			try:
+				packed = Pack(path)
+				if not packed.fresh():
+					log.info("Asset pack %s is out of date, using loose files", path)
+					packed = None
+			except (OSError, ValueError) as e:
+				log.warning("Could not open asset pack %s: %s", path, e)
+				packed = None
+		_packs[theme] = packed
+		return packed
+
+def listing(name: str) -> dict:
+	"""
+	Which optional source files a pack is built from, so adding or removing one (a parallax
+	layer, the heartbeat, a sound) makes the pack stale as well as editing one does.
+	"""
+	import helpers # the game modules import this one, so keep the cycle out of import time
+
+	if name == COMMON:
+		return {
+			"sfx": [sfx for sfx in constants.SFX if os.path.exists(os.path.join(constants.SFX_DIR, f"{sfx}.wav"))],
+			"logo": os.path.exists(constants.TITLE_LOGO),
+		}
+	return {
+		"layers": [path for path, _ in helpers.parallax_layer_files(os.path.join(constants.SPRITES_DIR, name))],
+		"heartbeat": os.path.exists(helpers.get_themed(constants.HEARTBEAT, name)),
+	}
+
+def open_common():
+	# the shared pack (sound effects and the title logo), or None like open_theme
+	return open_theme(COMMON)
+
+class Pack:
+	def __init__(self, path: str):
+		self.path = path
+		with open(path, "rb") as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, version, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError("not a version %d asset pack" % VERSION)
+		self.index = json.loads(self._map[index_offset:index_offset + index_length])
+		self._view = memoryview(self._map)
+
+	def fresh(self) -> bool:
+		if self.index["listing"] != listing(self.index["name"]):
+			return False
+		for path, mtime in self.index["sources"].items():
+			try:
+				if os.stat(path).st_mtime_ns != mtime:
+					return False
+			except OSError:
+				return False
+		return True
+
+	def _inflate(self, entry) -> bytes:
+		# zlib releases the GIL while inflating, so packs unpack in parallel on the decode pool
+		return zlib.decompress(self._view[entry["offset"]:entry["offset"] + entry["length"]], bufsize=entry["raw_length"])
+
+	def image(self, role: str):
+		# an unconverted surface over the inflated pixels (no image decoding)
+		entry = self.index["images"].get(role)
+		if entry is None:
+			return None
+		return pygame.image.frombuffer(self._inflate(entry), tuple(entry["size"]), self.index["pixel_format"])
+
+	def strip(self, role: str):
+		# the frames of a pre-sliced strip, each a surface over its part of one inflated blob
+		entry = self.index["strips"].get(role)
+		if entry is None:
+			return None
+		data = memoryview(self._inflate(entry))
+		size = tuple(entry["size"])
+		length = size[0] * size[1] * 4
+		return [pygame.image.frombuffer(data[i * length:(i + 1) * length], size, self.index["pixel_format"]) for i in range(entry["count"])]
+
+	def layers(self):
+		# [(role, speed, night)] back to front; the images come from image(role)
+		return [(layer["role"], layer["speed"], layer["night"]) for layer in self.index["layers"]]
+
+	def sfx(self, name: str):
+		# raw PCM for a sound, or None if missing or packed for a different mixer format
+		entry = self.index["sfx"].get(name)
+		if entry is None or tuple(self.index["mixer"] or ()) != pygame.mixer.get_init():
+			return None
+		return self._inflate(entry)
+
+# compiler
+
+class _Writer:
+	# collects compressed blobs and their index, then writes the pack in one go
+	def __init__(self, name: str):
+		self.blobs = []
+		self.offset = HEADER.size
+		self.index = {
+			"name": name,
+			"pixel_format": PIXEL_FORMAT,
+			"mixer": None,
+			"images": {},
+			"strips": {},
+			"layers": [],
+			"sfx": {},
+			"sources": {},
+			"listing": listing(name),
+		}
+
+	def blob(self, data: bytes) -> dict:
+		packed = zlib.compress(data, LEVEL)
+		self.blobs.append(packed)
+		entry = {"offset": self.offset, "length": len(packed), "raw_length": len(data)}
+		self.offset += len(packed)
+		return entry
+
+	def source(self, path: str):
+		self.index["sources"][path] = os.stat(path).st_mtime_ns
+
+	def image(self, role: str, path: str):
+		surf = pygame.image.load(path)
+		self.index["images"][role] = dict(self.blob(pygame.image.tobytes(surf, PIXEL_FORMAT)), size=list(surf.get_size()))
+		self.source(path)
+
+	def strip(self, role: str, path: str, size: int, min_count: int):
+		frames = sprites.slice_strip(pygame.image.load(path), size, size, min_count)
+		data = b"".join(pygame.image.tobytes(frame, PIXEL_FORMAT) for frame in frames)
+		self.index["strips"][role] = dict(self.blob(data), size=[size, size], count=len(frames))
+		self.source(path)
+
+	def write(self, out_path: str) -> str:
+		index_data = json.dumps(self.index, separators=(",", ":")).encode("utf-8")
+		os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+		tmp_path = out_path + ".tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(HEADER.pack(MAGIC, VERSION, self.offset, len(index_data)))
+			for blob in self.blobs:
+				f.write(blob)
+			f.write(index_data)
+		os.replace(tmp_path, out_path)
+		return out_path
+
+def compile_theme(theme: str, out_path: str = None) -> str:
+	"""
+	Pack a theme's sprites (as compressed raw pixels, with the strips already cut into frames)
+	into one file. Sound effects and the logo go in the common pack instead.
+	"""
+	import helpers # the game modules import this one, so keep the cycle out of import time
+
+	writer = _Writer(theme)
+	for role, asset in (("player", constants.PLAYER), ("mascot", constants.MASCOT)):
+		writer.image(role, helpers.get_themed(asset, theme))
+	for role, (asset, size, min_count) in STRIPS.items():
+		writer.strip(role, helpers.get_themed(asset, theme), size, min_count)
+	heartbeat = helpers.get_themed(constants.HEARTBEAT, theme)
+	if os.path.exists(heartbeat):
+		writer.image("heartbeat", heartbeat)
+	for i, (path, speed) in enumerate(helpers.parallax_layer_files(os.path.join(constants.SPRITES_DIR, theme))):
+		role = f"layer_{i}"
+		writer.image(role, path)
+		writer.index["layers"].append({"role": role, "speed": speed, "night": "night" in path})
+	return writer.write(out_path or pack_path(theme))
+
+def compile_common(out_path: str = None) -> str:
+	"""
+	Pack every sound effect (as compressed PCM in the current mixer format) and the title logo.
+	Run with the mixer initialised the way the game initialises it.
+	"""
+	writer = _Writer(COMMON)
+	writer.index["mixer"] = list(pygame.mixer.get_init() or ()) or None
+	if os.path.exists(constants.TITLE_LOGO):
+		writer.image("logo", constants.TITLE_LOGO)
+	if writer.index["mixer"]:
+		for name in constants.SFX:
+			path = os.path.join(constants.SFX_DIR, f"{name}.wav")
+			if os.path.exists(path):
+				writer.index["sfx"][name] = writer.blob(pygame.mixer.Sound(path).get_raw())
+				writer.source(path)
+	return writer.write(out_path or pack_path(COMMON))
+
+if __name__ == "__main__": # python src/pack.py [common] [theme ...] (from the repository root)
+	import themes
+	pygame.mixer.init()
+	names = sys.argv[1:] or [COMMON] + themes.available()
+	for name in names:
+		path = compile_common() if name == COMMON else compile_theme(name)
+		print(f"{name}: {path} ({os.path.getsize(path) // 1024} KiB)")
@@ -0,0 +1,78 @@
+"""
+Startup asset loading
+"""
+
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import log
+
+class Preloader:
+	"""
+	Decodes independent assets concurrently on a thread pool (image and WAV decoding release
+	the GIL) and times every asset. Anything that needs the display, like convert_alpha, goes
+	through finish()/timed() on the main thread. report() logs the per-asset breakdown.
+	Jobs may be submitted from other threads too (the theme loader decodes a bundle through it).
+	"""
+	def __init__(self, workers: int = None):
+		# at least two workers: decoding also waits on disk
+		self.workers = workers or max(2, min(8, os.cpu_count() or 2))
+		self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="asset-decode")
+		self.jobs = {} # name -> future of (value, decode seconds)
+		self.timings = {} # name -> {"decode_ms", "wait_ms", "main_ms"}
+		self.started = time.perf_counter()
+		self.submitted = 0
+		self.finished = 0
+		self._lock = threading.Lock()
+
+	def submit(self, name: str, fn, *args):
+		def run():
+			t = time.perf_counter()
+			value = fn(*args)
+			return value, time.perf_counter() - t
+		with self._lock:
+			self.submitted += 1
+		future = self.pool.submit(run)
+		future.add_done_callback(self._done)
+		self.jobs[name] = future
+
+	def _done(self, future):
+		with self._lock:
+			self.finished += 1
+
+	def progress(self) -> float:
+		# fraction of submitted jobs that have finished decoding (0..1)
+		with self._lock:
+			return self.finished / self.submitted if self.submitted else 1.0
+
+	def idle(self) -> bool:
+		with self._lock:
+			return self.finished == self.submitted
+
+	def result(self, name: str, finish = None):
+		# wait for a decode, then run finish(value) on this (main) thread; re-raises decode errors
+		t = time.perf_counter()
+		value, decode = self.jobs.pop(name).result()
+		waited = time.perf_counter() - t
+		main = 0.0
+		if finish is not None:
+			t = time.perf_counter()
+			value = finish(value)
+			main = time.perf_counter() - t
+		self.timings[name] = {"decode_ms": round(decode * 1000, 2), "wait_ms": round(waited * 1000, 2), "main_ms": round(main * 1000, 2)}
+		return value
+
+	def timed(self, name: str, fn, *args):
+		# main-thread step that belongs in the report
+		t = time.perf_counter()
+		value = fn(*args)
+		self.timings[name] = {"decode_ms": 0.0, "wait_ms": 0.0, "main_ms": round((time.perf_counter() - t) * 1000, 2)}
+		return value
+
+	def report(self):
+		# stop the pool and write the startup timing report
+		self.pool.shutdown(wait=False)
+		total = (time.perf_counter() - self.started) * 1000
+		decode = sum(t["decode_ms"] for t in self.timings.values())
+		for name, t in sorted(self.timings.items(), key=lambda item: -(item[1]["decode_ms"] + item[1]["main_ms"])):
+			log.debug("startup %-28s decode %7.2f ms  wait %7.2f ms  main %7.2f ms", name, t["decode_ms"], t["wait_ms"], t["main_ms"])
+		log.report("startup", total_ms=round(total, 2), decode_ms=round(decode, 2), workers=self.workers, assets=self.timings)
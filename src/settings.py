@@ -2,8 +2,8 @@
 Game settings
 """
 
-import json, os
-import constants
+import json, os, threading, time
+import constants, log
 
 class SettingsManager:
 	DEFAULTS = {
@@ -11,30 +11,115 @@ class SettingsManager:
 		"beat_sound": False,
 		"debug": False,
 		"music_latency": constants.MUSIC_LATENCY,
+		"audio_latency": constants.AUDIO_LATENCY, # mixer preset, takes effect on the next launch
 		"master_volume": 0.7,
 		"idle": False,
 		"intro": True,
 	}
 
-	def __init__(self, path):
+	SAVE_DELAY = 0.5 # seconds without further changes before a write happens
+
+	def __init__(self, path, save_delay = SAVE_DELAY):
 		self.path = path
+		self.save_delay = save_delay
 		self._data = dict(SettingsManager.DEFAULTS)
+
+		# write-behind state (guarded by _cond)
+		self._cond = threading.Condition()
+		self._dirty = False
+		self._changed_at = 0.0
+		self._closed = False
+		self._worker = None
+
 		self.load()
-	
+
 	def load(self):
 		if os.path.exists(self.path):
-			with open(self.path, "r", encoding="utf-8") as f:
-				data = json.load(f)
+			try:
+				with open(self.path, "r", encoding="utf-8") as f:
+					data = json.load(f)
+			except (OSError, ValueError) as e:
+				log.warning("Could not read settings from %s: %s", self.path, e)
+				return
+			with self._cond:
 				self._data.update(data)
 
 	def save(self):
-		os.makedirs(os.path.dirname(self.path), exist_ok=True)
-		with open(self.path, "w", encoding="utf-8") as f:
-			json.dump(self._data, f, indent=2)
+		# mark dirty; the worker writes once changes have settled for save_delay
+		with self._cond:
+			self._dirty = True
+			self._changed_at = time.monotonic()
+			if self._closed:
+				return # a flush is in progress; it restarts the worker for changes made meanwhile
+			self._start()
+			self._cond.notify()
+
+	def flush(self):
+		# stop the worker and write any pending changes now (call on exit/restart); later changes are saved as usual
+		with self._cond:
+			self._closed = True
+			self._cond.notify()
+			worker = self._worker
+			self._worker = None
+		if worker is not None:
+			worker.join()
+		with self._cond:
+			snapshot = dict(self._data) if self._dirty else None
+			self._dirty = False
+		if snapshot is not None:
+			self._write(snapshot)
+		with self._cond:
+			self._closed = False
+			if self._dirty:
+				self._start()
 
 	def get(self, key):
 		return self._data.get(key, SettingsManager.DEFAULTS.get(key))
-	
+
 	def set(self, key, value):
-		self._data[key] = value
-		self.save()
\ No newline at end of file
+		with self._cond:
+			if key in self._data and self._data[key] == value and type(self._data[key]) is type(value):
+				return
+			self._data[key] = value
+		self.save()
+
+	# internals
+
+	def _start(self):
+		# (with _cond held)
+		if self._worker is None:
+			self._worker = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+			self._worker.start()
+
+	def _run(self):
+		with self._cond:
+			while not self._closed:
+				if not self._dirty:
+					self._cond.wait()
+					continue
+				remaining = self._changed_at + self.save_delay - time.monotonic()
+				if remaining > 0:
+					self._cond.wait(remaining)
+					continue
+				snapshot = dict(self._data)
+				self._dirty = False
+
+				# write without holding the lock so set() never waits on disk
+				self._cond.release()
+				try:
+					self._write(snapshot)
+				finally:
+					self._cond.acquire()
+
+	def _write(self, data):
+		# write to a temporary file and rename over the old one so a crash never leaves a truncated file
+		tmp_path = self.path + ".tmp"
+		try:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			with open(tmp_path, "w", encoding="utf-8") as f:
+				json.dump(data, f, indent=2)
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmp_path, self.path)
+		except OSError as e:
+			log.warning("Could not save settings to %s: %s", self.path, e)
@@ -1,40 +1,206 @@
-import pygame
-from typing import List, Tuple
+import os, threading, pygame
+from typing import List, NamedTuple, Tuple
+
+class ImageCache:
+	"""
+	Process-wide cache of decoded images keyed by (path, mtime, pixel format), so revisiting a
+	theme or rebuilding a screen never decodes the same PNG twice. load() hands out a shared
+	surface and counts a reference; release() drops one and evict() frees entries nobody holds.
+	Shared surfaces must not be drawn onto.
+	"""
+	def __init__(self):
+		self._entries = {} # key -> [surface, refs]
+		self._keys = {} # id(surface) -> key
+		self._lock = threading.Lock()
+
+	def load(self, path: str, convert: bool = True) -> pygame.Surface:
+		# convert=False decodes only and is safe off the main thread;
+		# convert=True returns a display-format copy (main thread, display must exist)
+		key = (os.path.normpath(path), os.stat(path).st_mtime_ns, self._format() if convert else None)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				entry[1] += 1
+				return entry[0]
+
+		if convert:
+			# reuse a raw decode of the same file (e.g. from a background preload) if there is one
+			with self._lock:
+				raw = self._entries.get(key[:2] + (None,))
+			surface = raw[0] if raw is not None else pygame.image.load(path)
+			surface = surface.convert_alpha()
+		else:
+			surface = pygame.image.load(path)
+
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None: # another thread may have loaded it meanwhile
+				entry = self._entries[key] = [surface, 0]
+				self._keys[id(surface)] = key
+			entry[1] += 1
+			return entry[0]
+
+	def release(self, surface: pygame.Surface):
+		with self._lock:
+			key = self._keys.get(id(surface))
+			if key is not None:
+				entry = self._entries[key]
+				entry[1] = max(0, entry[1] - 1)
+
+	def evict(self) -> int:
+		# drop every entry without references; returns how many were freed
+		with self._lock:
+			unused = [key for key, (_, refs) in self._entries.items() if refs <= 0]
+			for key in unused:
+				surface, _ = self._entries.pop(key)
+				self._keys.pop(id(surface), None)
+			return len(unused)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._keys.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
+	@staticmethod
+	def _format():
+		display = pygame.display.get_surface()
+		if display is None:
+			return ("alpha",)
+		return ("alpha", display.get_bitsize(), display.get_masks())
+
+images = ImageCache()
 
 class SpriteSheet:
-	def __init__(self, path: str):
-		self.sheet = pygame.image.load(path).convert_alpha()
+	def __init__(self, path: str = None, surface: pygame.Surface = None):
+		# either load from disk (through the shared cache) or wrap an already loaded surface
+		self.path = path if surface is None else None
+		self.sheet = surface if surface is not None else images.load(path)
+		self._slices = {}
+
+	def release(self):
+		if self.path is not None:
+			images.release(self.sheet)
+			self.path = None
 
 	def image_at(self, rect: Tuple[int,int,int,int]) -> pygame.Surface:
-		x,y,w,h = rect
-		image = pygame.Surface((w,h), pygame.SRCALPHA)
-		image.blit(self.sheet, (0,0), rect)
+		# slices are subsurfaces sharing the sheet's pixels (cached per rect)
+		rect = tuple(rect)
+		image = self._slices.get(rect)
+		if image is None:
+			if self.sheet.get_rect().contains(rect):
+				image = self.sheet.subsurface(rect)
+			else:
+				# partly outside the sheet: copy onto a transparent frame
+				x,y,w,h = rect
+				image = pygame.Surface((w,h), pygame.SRCALPHA)
+				image.blit(self.sheet, (0,0), rect)
+			self._slices[rect] = image
 		return image
 	
 	def load_strip(self, rect: Tuple[int,int,int,int], count: int) -> List[pygame.Surface]:
 		x,y,w,h = rect
 		return [self.image_at((x + i*w, y, w, h)) for i in range(count)]
 
+def slice_strip(sheet: pygame.Surface, w: int, h: int, min_count: int = 1) -> List[pygame.Surface]:
+	# separate copies of the frames of a horizontal strip, padded with blank frames up to min_count
+	frames = []
+	for i in range(max(min_count, sheet.get_width() // w)):
+		frame = pygame.Surface((w, h), pygame.SRCALPHA)
+		frame.blit(sheet, (0,0), (i * w, 0, w, h))
+		frames.append(frame)
+	return frames
+
+# collision frames: an image with its mask and the box around its opaque pixels, built once
+# at load/resize time so nothing builds masks during gameplay
+
+class MaskedFrame(NamedTuple):
+	image: pygame.Surface
+	mask: pygame.mask.Mask
+	bbox: pygame.Rect # opaque pixels, relative to the image (empty for a blank frame)
+
+def masked(image: pygame.Surface) -> MaskedFrame:
+	mask = pygame.mask.from_surface(image)
+	rects = mask.get_bounding_rects()
+	bbox = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+	return MaskedFrame(image, mask, bbox)
+
+class ScaledFrames:
+	"""
+	Scaled, masked copies of native sprites for the current size, keyed by the native surface
+	itself (so a freed surface can't alias a new one). A new size drops every old frame, which
+	keeps the cache bounded to the sprites in use.
+	"""
+	def __init__(self):
+		self.size = None
+		self.frames = {} # native surface -> MaskedFrame
+
+	def prepare(self, natives, size):
+		# build ahead of time (theme load and resize)
+		for native in natives:
+			self.get(native, size)
+
+	def get(self, native: pygame.Surface, size) -> MaskedFrame:
+		size = tuple(size)
+		if size != self.size:
+			self.frames.clear()
+			self.size = size
+		frame = self.frames.get(native)
+		if frame is None:
+			frame = masked(pygame.transform.scale(native, size))
+			self.frames[native] = frame
+		return frame
+
+# animation clocks (seconds), advanced once per frame by tick(); every AnimatedSprite derives
+# its frame from the clock it runs on, so sprites need no per-frame update
+
+class Clock:
+	def __init__(self):
+		self.time = 0.0
+
+clock = Clock() # HUD and menu sprites (like the mascot), always running
+game_clock = Clock() # gameplay sprites (like the player), only running during play
+
+def tick(dt: float, gameplay: bool = True):
+	clock.time += dt
+	if gameplay:
+		game_clock.time += dt
+
 class AnimatedSprite:
-	def __init__(self, frames: List[pygame.Surface], fps: float = 8.0, loop: bool = True):
+	def __init__(self, frames: List[pygame.Surface], fps: float = 8.0, loop: bool = True, clock: Clock = clock):
 		self.frames = frames
-		self.fps = fps
+		self._fps = fps
 		self.loop = loop
-		self.time = 0.0
-		self.index = 0
-	
-	def update(self, dt: float):
-		if len(self.frames) <= 1: return
-		self.time += dt
-		frame_time = 1.0 / max(0.0001, self.fps)
-		while self.time >= frame_time:
-			self.time -= frame_time
-			self.index += 1
-			if self.index >= len(self.frames):
-				if self.loop:
-					self.index = 0
-				else:
-					self.index = len(self.frames) - 1
+		self.clock = clock
+		self.start = clock.time # clock time of frame 0
+
+	@property
+	def fps(self) -> float:
+		return self._fps
+
+	@fps.setter
+	def fps(self, fps: float):
+		# rebase the start time so the animation carries on from the same point at the new speed
+		if fps == self._fps:
+			return
+		elapsed_frames = (self.clock.time - self.start) * self._fps
+		self._fps = fps
+		self.start = self.clock.time - elapsed_frames / max(0.0001, fps)
+
+	@property
+	def index(self) -> int:
+		count = len(self.frames)
+		if count <= 1:
+			return 0
+		i = int((self.clock.time - self.start) * self._fps)
+		if self.loop:
+			return i % count
+		return min(i, count - 1)
+
+	def restart(self):
+		self.start = self.clock.time
 	
 	def get_image(self) -> pygame.Surface:
-		return self.frames[self.index]
\ No newline at end of file
+		return self.frames[self.index]
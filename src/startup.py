@@ -0,0 +1,89 @@
+"""
+Startup timing and deferred imports
+"""
+
+# imported first by main (stdlib only, so it doesn't skew what it measures)
+import builtins, importlib, os, sys, time
+
+started = time.perf_counter()
+marks = {} # name -> ms since started
+
+# import profile: CAMPFIRE_IMPORT_PROFILE=1 times every module imported after this one,
+# like python -X importtime, and logs a summary once the window is up
+_imports = [] # (name, self ms, cumulative ms) in the order imports finished
+_stack = [] # child-time accumulators for the imports in progress
+_import = builtins.__import__
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+	if level or name in sys.modules:
+		return _import(name, globals, locals, fromlist, level)
+	_stack.append(0.0)
+	t = time.perf_counter()
+	try:
+		return _import(name, globals, locals, fromlist, level)
+	finally:
+		total = time.perf_counter() - t
+		children = _stack.pop()
+		if _stack:
+			_stack[-1] += total
+		_imports.append((name, round((total - children) * 1000, 2), round(total * 1000, 2)))
+
+profiling = os.environ.get("CAMPFIRE_IMPORT_PROFILE", "") not in ("", "0")
+if profiling:
+	builtins.__import__ = _timed_import
+
+class LazyModule:
+	"""
+	Stands in for a module that is only imported when one of its attributes is first used,
+	so heavy optional modules (numpy, pygame.scrap) stay off the path to the first frame.
+	"""
+	def __init__(self, name: str):
+		self.__dict__["_name"] = name
+		self.__dict__["_module"] = None
+
+	def _load(self):
+		module = self.__dict__["_module"]
+		if module is None:
+			t = time.perf_counter()
+			module = importlib.import_module(self._name)
+			self.__dict__["_module"] = module
+			if profiling:
+				_imports.append((f"{self._name} (deferred)", 0.0, round((time.perf_counter() - t) * 1000, 2)))
+		return module
+
+	def __getattr__(self, attr):
+		return getattr(self._load(), attr)
+
+	def __repr__(self):
+		state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+		return f"<lazy module '{self._name}' ({state})>"
+
+def lazy(name: str) -> LazyModule:
+	return LazyModule(name)
+
+def mark(name: str) -> float:
+	# record a startup milestone (ms since main started importing)
+	marks[name] = round((time.perf_counter() - started) * 1000, 2)
+	return marks[name]
+
+def check_budget(name: str, budget_ms: float, top: int = 10):
+	"""
+	Log the startup milestones, warn if a milestone came later than its budget and, in
+	profile mode, log the slowest imports so far.
+	"""
+	import log
+	elapsed = marks.get(name)
+	if elapsed is None:
+		elapsed = mark(name)
+	if elapsed > budget_ms:
+		log.warning("Startup: reached %s after %.0f ms (budget %.0f ms)", name, elapsed, budget_ms)
+	report = {"milestones": dict(marks), "budget_ms": budget_ms, "over_budget": elapsed > budget_ms}
+	if profiling:
+		builtins.__import__ = _import
+		slowest = sorted(_imports, key=lambda i: -i[2])[:top]
+		for module, self_ms, total_ms in slowest:
+			log.info("import %-32s self %8.2f ms  cumulative %8.2f ms", module, self_ms, total_ms)
+		report["imports"] = len(_imports)
+		report["import_ms"] = round(sum(i[1] for i in _imports), 2)
+		report["slowest"] = {module: total_ms for module, _, total_ms in slowest}
+	log.report("startup_budget", **report)
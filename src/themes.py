@@ -0,0 +1,235 @@
+"""
+Theme asset bundles
+"""
+
+import os, threading
+import helpers, sprites, pack, constants, log
+
+def available() -> list:
+	# every folder under sprites/ is a theme
+	try:
+		names = os.listdir(constants.SPRITES_DIR)
+	except OSError:
+		return []
+	return sorted(n for n in names if os.path.isdir(os.path.join(constants.SPRITES_DIR, n)))
+
+class ThemeBundle:
+	"""
+	All native (unscaled) images for one theme. Decoding happens in load() and is safe
+	to run off the main thread; convert() must run on the main thread once the display exists.
+	"""
+	def __init__(self, name: str):
+		self.name = name
+		self.player = None
+		self.tiles = [] # native ground tiles, cut from the tileset strip
+		self.obstacles = [] # native obstacle frames, cut from the obstacle strip
+		self.mascot = None
+		self.heartbeat = None
+		self.layers = [] # (surface, speed, night)
+		self.cached = [] # raw decodes this bundle holds references to in sprites.images (until convert())
+		self.converted = False
+
+	@classmethod
+	def load(cls, name: str, loader = None) -> "ThemeBundle":
+		# loader: a preload.Preloader to decode every image concurrently (startup)
+		packed = pack.open_theme(name)
+		if packed is not None:
+			return cls.from_pack(name, packed, loader)
+
+		paths = {
+			"player": helpers.get_themed(constants.PLAYER, name),
+			"tileset": helpers.get_themed(constants.TILESET, name),
+			"obstacles": helpers.get_themed(constants.OBSTACLES, name),
+			"mascot": helpers.get_themed(constants.MASCOT, name),
+		}
+		heartbeat_path = helpers.get_themed(constants.HEARTBEAT, name)
+		if os.path.exists(heartbeat_path):
+			paths["heartbeat"] = heartbeat_path
+		layer_files = helpers.parallax_layer_files(os.path.join(constants.SPRITES_DIR, name))
+		for i, (path, _) in enumerate(layer_files):
+			paths[f"layer_{i}"] = path
+
+		# raw decodes go through the shared image cache, so a bundle rebuilt later costs no decoding
+		decode = lambda path: sprites.images.load(path, convert=False)
+		if loader is not None:
+			for role, path in paths.items():
+				loader.submit(f"{name}/{role}", decode, path)
+			get = lambda role: loader.result(f"{name}/{role}")
+		else:
+			get = lambda role: decode(paths[role])
+
+		bundle = cls(name)
+		bundle.player = get("player")
+		tileset = get("tileset")
+		obstacles = get("obstacles")
+		bundle.tiles = sprites.slice_strip(tileset, constants.NATIVE_TILE, constants.NATIVE_TILE, constants.MIN_TILES)
+		bundle.obstacles = sprites.slice_strip(obstacles, constants.NATIVE_OBS, constants.NATIVE_OBS)
+		bundle.mascot = get("mascot")
+		if "heartbeat" in paths:
+			try:
+				bundle.heartbeat = get("heartbeat")
+			except Exception:
+				bundle.heartbeat = None
+		for i, (path, speed) in enumerate(layer_files):
+			bundle.layers.append((get(f"layer_{i}"), speed, "night" in path))
+		bundle.cached = [bundle.player, tileset, obstacles, bundle.mascot] + [img for img, _, _ in bundle.layers]
+		if bundle.heartbeat is not None:
+			bundle.cached.append(bundle.heartbeat)
+		return bundle
+
+	@classmethod
+	def from_pack(cls, name: str, packed, loader = None) -> "ThemeBundle":
+		# raw pixels inflated out of the mapped pack file (strips come already cut), no image decoding
+		layers = packed.layers()
+		jobs = {
+			"player": (packed.image, "player"),
+			"tiles": (packed.strip, "tiles"),
+			"obstacles": (packed.strip, "obstacles"),
+			"mascot": (packed.image, "mascot"),
+			"heartbeat": (packed.image, "heartbeat"),
+		}
+		for role, _, _ in layers:
+			jobs[role] = (packed.image, role)
+		if loader is not None:
+			for role, (fn, arg) in jobs.items():
+				loader.submit(f"{name}/{role}", fn, arg)
+			get = lambda role: loader.result(f"{name}/{role}")
+		else:
+			get = lambda role: jobs[role][0](jobs[role][1])
+
+		bundle = cls(name)
+		bundle.player = get("player")
+		bundle.tiles = get("tiles")
+		bundle.obstacles = get("obstacles")
+		bundle.mascot = get("mascot")
+		bundle.heartbeat = get("heartbeat")
+		bundle.layers = [(get(role), speed, night) for role, speed, night in layers]
+		return bundle
+
+	def convert(self):
+		# convert to the display pixel format (main thread only, once)
+		if self.converted:
+			return self
+		self.player = self.player.convert_alpha()
+		self.tiles = [tile.convert_alpha() for tile in self.tiles]
+		self.obstacles = [frame.convert_alpha() for frame in self.obstacles]
+		self.mascot = self.mascot.convert_alpha()
+		if self.heartbeat is not None:
+			self.heartbeat = self.heartbeat.convert_alpha()
+		self.layers = [(img.convert_alpha(), speed, night) for img, speed, night in self.layers]
+		self.converted = True
+		# the display-format copies replace the raw decodes; the cache keeps them for a revisit until evict()
+		self.release()
+		return self
+
+	def release(self):
+		# give the raw decodes back to the image cache (evict() can then free them)
+		for surface in self.cached:
+			sprites.images.release(surface)
+		self.cached = []
+
+class ThemeLoader:
+	"""
+	Loads bundles on a background thread and keeps them until trim(), so switching between
+	prefetched themes is instant. The game polls take_ready() between frames and swaps there.
+	"""
+	def __init__(self):
+		self.bundles = {}
+		self.failed = set()
+		self._lock = threading.Lock()
+		self._pending = [] # names waiting to be loaded, in order
+		self._wanted = None # the theme to hand back from take_ready()
+		self._loaders = {} # name -> preload.Preloader to decode that theme's images with
+		self._worker = None
+
+	def get(self, name: str, loader = None) -> ThemeBundle:
+		# synchronous load (used at startup when there is nothing to show yet)
+		with self._lock:
+			bundle = self.bundles.get(name)
+		if bundle is None:
+			bundle = ThemeBundle.load(name, loader)
+			with self._lock:
+				self.bundles[name] = bundle
+		if loader is not None:
+			return loader.timed(f"{name}/convert", bundle.convert)
+		return bundle.convert()
+
+	def request(self, name: str, loader = None):
+		# ask for a theme to be swapped in once it is ready
+		with self._lock:
+			self._wanted = name
+			if loader is not None:
+				self._loaders[name] = loader
+			if name in self.bundles:
+				return
+			self.failed.discard(name)
+			if name in self._pending:
+				self._pending.remove(name)
+			self._pending.insert(0, name)
+		self._start()
+
+	def prefetch(self, names):
+		# warm the cache in the background without asking for a swap
+		with self._lock:
+			for name in names:
+				if name not in self.bundles and name not in self._pending and name not in self.failed:
+					self._pending.append(name)
+		self._start()
+
+	def take_ready(self):
+		# returns (name, bundle) when the requested theme has finished loading,
+		# (name, None) if it failed to load, or None while it is still pending
+		with self._lock:
+			name = self._wanted
+			if name is None:
+				return None
+			if name in self.bundles:
+				self._wanted = None
+				bundle = self.bundles[name]
+			elif name in self.failed:
+				self._wanted = None
+				return (name, None)
+			else:
+				return None
+		return (name, bundle.convert())
+
+	def trim(self, keep: str) -> int:
+		# drop every bundle but the one in use and free their images; returns how many were freed
+		with self._lock:
+			names = [name for name in self.bundles if name != keep and name != self._wanted]
+			self._pending = [name for name in self._pending if name == self._wanted] # unfinished prefetches
+			dropped = [self.bundles.pop(name) for name in names]
+		for bundle in dropped:
+			bundle.release()
+		freed = sprites.images.evict()
+		if dropped:
+			log.debug("Released themes %s (%d images freed)", ", ".join(names), freed)
+		return freed
+
+	def _start(self):
+		with self._lock:
+			if self._worker is not None or not self._pending:
+				return
+			self._worker = threading.Thread(target=self._run, name="theme-loader", daemon=True)
+			self._worker.start()
+
+	def _run(self):
+		while True:
+			with self._lock:
+				if not self._pending:
+					self._worker = None
+					return
+				name = self._pending.pop(0)
+				loader = self._loaders.pop(name, None)
+				if name in self.bundles:
+					continue
+			try:
+				bundle = ThemeBundle.load(name, loader)
+			except Exception as e:
+				log.warning("Could not load theme '%s': %s", name, e)
+				with self._lock:
+					self.failed.add(name)
+				continue
+			with self._lock:
+				self.bundles[name] = bundle
+			log.debug("Theme '%s' loaded in the background", name)
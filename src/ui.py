@@ -1,5 +1,19 @@
-import pygame, pygame.scrap as scrap
-import helpers
+import bisect, pygame
+import helpers, startup, log
+
+scrap = startup.lazy("pygame.scrap") # clipboard, only needed once a text field is used
+_clipboard = None # scrap once initialised, False if it isn't available
+
+def clipboard():
+	# imports and initialises pygame.scrap on the first copy/paste; None without a clipboard
+	global _clipboard
+	if _clipboard is None:
+		try:
+			scrap.init()
+			_clipboard = scrap
+		except Exception:
+			_clipboard = False
+	return _clipboard or None
 
 def draw_panel(
 	surf,
@@ -58,15 +72,28 @@ class Button:
 		self.enabled = True
 		self.id = id
 
+		# pre-composited surface per visual state, valid for _cache_size only
+		self._state_cache = {}
+		self._cache_size = None
+
 		self._render_text()
 
 	def _render_text(self):
 		self.text_surf = self.font.render(self.text, True, self.fg)
 		self.text_rect = self.text_surf.get_rect(center=self.rect.center)
+		self._state_cache.clear()
 	
 	def set_text(self, text):
+		if text == self.text:
+			return
 		self.text = text
 		self._render_text()
+
+	def set_style(self, **style):
+		# change colours/radius (bg, fg, border, hover_bg, radius) and drop cached variants
+		for key, value in style.items():
+			setattr(self, key, value)
+		self._render_text()
 	
 	def handle_event(self, event):
 		if not self.enabled:
@@ -85,33 +112,312 @@ class Button:
 	def _click(self):
 		if callable(self.on_click):
 			self.on_click(self)
-	
-	def draw(self, surf):
+
+	def _state(self):
+		if not self.enabled:
+			return "disabled"
+		if self.focus:
+			return "focus"
+		if self.hover:
+			return "hover"
+		return "normal"
+
+	def _build_state(self, state):
+		# composite border, background, glow, text and focus outline into one surface
+		w, h = self.rect.size
+		surf = pygame.Surface((w + 6, h + 6), pygame.SRCALPHA)
+		inner = pygame.Rect(3, 3, w, h)
+
 		# background colour changes when focused or hovered
-		if self.focus or self.hover:
+		if state in ("focus", "hover"):
 			bg = (255, 245, 235) # warmer when focused
 			border_col = (255, 200, 120)
 		else:
 			bg = self.bg
 			border_col = self.border
-		
+
 		# draw border and background
-		pygame.draw.rect(surf, border_col, self.rect.inflate(6,6), border_radius=self.radius)
-		pygame.draw.rect(surf, bg, self.rect, border_radius=self.radius)
+		pygame.draw.rect(surf, border_col, surf.get_rect(), border_radius=self.radius)
+		pygame.draw.rect(surf, bg, inner, border_radius=self.radius)
 
 		# subtle glow when focused
-		if self.focus or self.hover:
-			glow = pygame.Surface((self.rect.w, self.rect.h), pygame.SRCALPHA)
+		if state in ("focus", "hover"):
+			glow = pygame.Surface((w, h), pygame.SRCALPHA)
 			glow.fill((255, 220, 160, 40))
-			surf.blit(glow, self.rect.topleft, special_flags=pygame.BLEND_RGBA_ADD)
+			surf.blit(glow, inner.topleft, special_flags=pygame.BLEND_RGBA_ADD)
 
 		# text
-		self.text_rect = self.text_surf.get_rect(center=self.rect.center)
-		surf.blit(self.text_surf, self.text_rect)
+		surf.blit(self.text_surf, self.text_surf.get_rect(center=inner.center))
 
 		# focus indicator outline
-		if self.focus:
-			pygame.draw.rect(surf, (255, 210, 140), self.rect, width=3, border_radius=self.radius)
+		if state == "focus":
+			pygame.draw.rect(surf, (255, 210, 140), inner, width=3, border_radius=self.radius)
+
+		if state == "disabled":
+			surf.set_alpha(140)
+		return surf
+	
+	def draw(self, surf):
+		if self._cache_size != self.rect.size:
+			self._state_cache.clear()
+			self._cache_size = self.rect.size
+
+		state = self._state()
+		image = self._state_cache.get(state)
+		if image is None:
+			image = self._build_state(state)
+			self._state_cache[state] = image
+
+		self.text_rect = self.text_surf.get_rect(center=self.rect.center)
+		surf.blit(image, (self.rect.x - 3, self.rect.y - 3))
+
+class HitGrid:
+	"""
+	Uniform grid over widget rects. A point query only tests the few rects that overlap
+	the point's cell, however many widgets a screen has.
+	"""
+	CELL = 128 # px
+
+	def __init__(self, cell=CELL):
+		self.cell = cell
+		self.cells = {}
+
+	def clear(self):
+		self.cells.clear()
+
+	def insert(self, rect, item):
+		if rect.w <= 0 or rect.h <= 0:
+			return
+		c = self.cell
+		for cx in range(rect.left // c, (rect.right - 1) // c + 1):
+			for cy in range(rect.top // c, (rect.bottom - 1) // c + 1):
+				self.cells.setdefault((cx, cy), []).append((rect, item))
+
+	def query(self, x, y):
+		# later inserts win, so widgets added last (drawn on top) take the hit
+		bucket = self.cells.get((x // self.cell, y // self.cell))
+		if bucket:
+			for rect, item in reversed(bucket):
+				if rect.collidepoint(x, y):
+					return item
+		return None
+
+class FocusManager:
+	"""
+	Tracks which widget of an ordered list has keyboard focus and keeps the widgets'
+	focus flags in step (only the old and new widget are touched on a change).
+	"""
+	def __init__(self, widgets=None, wrap=False):
+		self.widgets = []
+		self.wrap = wrap
+		self.index = -1
+		self._current = None
+		for w in widgets or []:
+			self.add(w)
+
+	def add(self, widget):
+		self.widgets.append(widget)
+		if widget is not None:
+			widget.focus = False
+		if self.index < 0:
+			self.index = 0
+		self._apply()
+		return widget
+
+	def focused(self):
+		if 0 <= self.index < len(self.widgets):
+			return self.widgets[self.index]
+		return None
+
+	def set(self, widget):
+		if widget is not None and widget in self.widgets:
+			self.set_index(self.widgets.index(widget))
+
+	def set_index(self, index):
+		if not self.widgets:
+			return
+		self.index = max(0, min(len(self.widgets) - 1, index))
+		self._apply()
+
+	def move(self, step):
+		if not self.widgets:
+			return
+		if self.wrap:
+			self.set_index((self.index + step) % len(self.widgets))
+		else:
+			self.set_index(self.index + step)
+
+	def next(self):
+		self.move(1)
+
+	def prev(self):
+		self.move(-1)
+
+	def _apply(self):
+		new = self.focused()
+		if self._current is not None and self._current is not new:
+			self._current.focus = False
+		if new is not None:
+			new.focus = True
+		self._current = new
+
+class Dispatcher:
+	"""
+	Routes a screen's events to a single widget: keys go to the focused widget, mouse events
+	to the widget under the pointer (looked up in a HitGrid), and a widget that starts a drag
+	keeps getting motion until the button is released.
+
+	Widgets added with scrolled=True are indexed by their unscrolled rect and are only hit
+	inside viewport; scroll() returns the current vertical scroll offset.
+	"""
+	def __init__(self, focus=None, scroll=None):
+		self.focus = focus
+		self.scroll = scroll or (lambda: 0)
+		self.viewport = None
+		self.fixed = HitGrid()
+		self.scrolled = HitGrid()
+		self.rects = {} # widget -> (indexed rect, scrolled)
+		self.hovered = None
+		self.capture = None
+		self.on_hover = None
+
+	def clear(self):
+		self.fixed.clear()
+		self.scrolled.clear()
+		self.rects.clear()
+		self.capture = None
+
+	def add(self, widget, rect=None, scrolled=False):
+		rect = pygame.Rect(widget.rect if rect is None else rect)
+		self.rects[widget] = (rect, scrolled)
+		(self.scrolled if scrolled else self.fixed).insert(rect, widget)
+
+	def hit(self, pos):
+		x, y = pos
+		if self.viewport is not None and self.viewport.collidepoint(x, y):
+			widget = self.scrolled.query(x, y + self.scroll())
+			if widget is not None:
+				return widget
+		return self.fixed.query(x, y)
+
+	def dispatch(self, e):
+		# returns True if a widget consumed the event
+		if e.type == pygame.MOUSEMOTION:
+			if self.capture is not None:
+				return bool(self._deliver(self.capture, e))
+			self._set_hover(self.hit(e.pos))
+			return False
+
+		if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+			target = self.hit(e.pos)
+			focused = self.focus.focused() if self.focus else None
+			if focused is not None and focused is not target:
+				# the focused widget still sees clicks outside it (text inputs blur on them)
+				self._sync_rect(focused)
+				if not focused.rect.collidepoint(e.pos):
+					focused.handle_event(e)
+			if target is not None and self._deliver(target, e):
+				if self.focus is not None:
+					self.focus.set(target)
+				if getattr(target, "dragging", False):
+					self.capture = target
+				return True
+			return False
+
+		if e.type == pygame.MOUSEBUTTONUP and e.button == 1:
+			target, self.capture = self.capture, None
+			if target is not None:
+				self._deliver(target, e)
+				return True
+			return False
+
+		if e.type == pygame.KEYDOWN:
+			focused = self.focus.focused() if self.focus else None
+			return bool(focused is not None and self._deliver(focused, e))
+		return False
+
+	def _set_hover(self, widget):
+		if widget is self.hovered:
+			return
+		if self.hovered is not None:
+			self.hovered.hover = False
+		if widget is not None:
+			widget.hover = True
+		self.hovered = widget
+		if callable(self.on_hover):
+			self.on_hover(widget)
+
+	def _sync_rect(self, widget):
+		# scrolled widgets get their on-screen rect for the current scroll before handling
+		entry = self.rects.get(widget)
+		if entry is not None and entry[1]:
+			rect = entry[0]
+			widget.rect.topleft = (rect.x, rect.y - self.scroll())
+
+	def _deliver(self, widget, e):
+		self._sync_rect(widget)
+		return widget.handle_event(e)
+
+class ButtonStack:
+	"""
+	A menu of buttons that is built once. layout() only moves and resizes the buttons, so
+	hover/focus state survives window resizes. keys are the (previous, next) focus keys.
+	"""
+	def __init__(self, buttons=None, keys=(pygame.K_UP, pygame.K_DOWN)):
+		self.keys = keys
+		self.focus_manager = FocusManager(wrap=True)
+		self.dispatcher = Dispatcher(self.focus_manager)
+		self.buttons = self.focus_manager.widgets
+		for b in buttons or []:
+			self.add(b)
+
+	@property
+	def focus_index(self):
+		return self.focus_manager.index
+
+	def add(self, button):
+		self.focus_manager.add(button)
+		self.dispatcher.add(button)
+		return button
+
+	def layout(self, centre_x, top, width, height, gap, font=None):
+		for i, b in enumerate(self.buttons):
+			b.rect = pygame.Rect(centre_x - width // 2, top + i * (height + gap), width, height)
+			if font is not None:
+				b.font = font
+			b._render_text()
+		self.reindex()
+
+	def reindex(self):
+		# call after moving buttons by hand
+		self.dispatcher.clear()
+		for b in self.buttons:
+			self.dispatcher.add(b)
+
+	def focused(self):
+		return self.focus_manager.focused()
+
+	def focus_next(self):
+		self.focus_manager.next()
+
+	def focus_prev(self):
+		self.focus_manager.prev()
+
+	def handle_event(self, e):
+		if self.dispatcher.dispatch(e):
+			return True
+		if e.type == pygame.KEYDOWN:
+			if e.key == self.keys[0]:
+				self.focus_prev()
+				return True
+			elif e.key == self.keys[1]:
+				self.focus_next()
+				return True
+		return False
+
+	def draw(self, surf):
+		for b in self.buttons:
+			b.draw(surf)
 
 class ToggleSwitch:
 	def __init__(self, rect, value=False, radius=10,
@@ -146,7 +452,7 @@ class ToggleSwitch:
 	
 	def toggle(self):
 		self.value = not self.value
-		print(f"[DEBUG] Value of {self} set to {self.value}")
+		log.debug("%s set to %s", type(self).__name__, self.value)
 		if callable(self.on_change):
 			self.on_change(self.value)
 	
@@ -214,7 +520,8 @@ class Slider:
 	def set(self, v):
 		old = self.value
 		self.value = max(self.minv, min(self.maxv, v))
-		print(f"[DEBUG] Value of {self} set to {self.value}")
+		if self.value != old:
+			log.debug("%s set to %.3f", type(self).__name__, self.value)
 		if self.on_change and self.value != old:
 			self.on_change(self.value)
 	
@@ -244,7 +551,7 @@ class TextInput:
 		self.max_length = max_length
 
 		# editing state
-		self.focus = False
+		self._focus = False
 		self.cursor = len(self.text)
 		self.sel_start = None # selection starts index or None
 
@@ -255,18 +562,38 @@ class TextInput:
 		self._show_caret = True
 		self.hover = False
 
-		# callback
+		# callbacks
 		self.on_change = None
+		self.on_blur = None # editing finished (focus lost by any means)
 
-		# clipboard
-		try:
-			scrap.init()
-			self._scrap = scrap
-		except Exception:
-			self._scrap = None
+		# text metrics: _prefix[i] is font.size(text[:i]) (kerning included), kept in step with every edit
+		self._metrics_font = None
+		self._prefix = [0]
+		self._text_cache = None # (text, colour, font, surface)
 	
+	@property
+	def text(self):
+		return self._text
+
+	@property
+	def focus(self):
+		return self._focus
+
+	@focus.setter
+	def focus(self, value):
+		blurred = self._focus and not value
+		self._focus = value
+		if blurred and callable(self.on_blur):
+			self.on_blur()
+
+	@text.setter
+	def text(self, value):
+		# direct assignment drops the width tables; they are rebuilt on next use
+		self._text = str(value)
+		self._metrics_font = None
+
 	def set(self, text):
-		self.text = str(text)
+		self.text = text
 		self.cursor = min(len(self.text), self.cursor)
 		self._call_change()
 
@@ -283,14 +610,37 @@ class TextInput:
 		if a == b:
 			self.sel_start = None
 			return False
-		self.text = self.text[:a] + self.text[b:]
+		self._splice(a, b, "")
 		self.cursor = a
 		self.sel_start = None
 		self._call_change()
 		return True
+
+	def _splice(self, a, b, s):
+		# replace text[a:b] with s and patch the width tables from a onwards
+		self._text = self._text[:a] + s + self._text[b:]
+		if self._metrics_font is None:
+			return
+		# text[:a] is unchanged, so only the widths past it are measured again
+		self._measure(a)
+
+	def _widths(self):
+		# prefix width table for the current font (rebuilt only when the font itself changes, e.g. on resize)
+		font = self.font()
+		if font is not self._metrics_font:
+			self._metrics_font = font
+			self._measure(0)
+		return self._prefix
+
+	def _measure(self, start):
+		# widths of every prefix longer than text[:start], measured whole so kerning and glyph advances match the rendered text
+		size = self._metrics_font.size
+		del self._prefix[start + 1:]
+		self._prefix[0] = 0
+		self._prefix.extend(size(self._text[:i])[0] for i in range(start + 1, len(self._text) + 1))
 	
 	def _call_change(self):
-		print(f"[DEBUG] Value of {self} set to \"{self.text}\"")
+		log.debug("%s set to \"%s\"", type(self).__name__, self.text)
 		if callable(self.on_change):
 			try:
 				self.on_change(self.text)
@@ -300,30 +650,33 @@ class TextInput:
 	def _copy_selection_to_clipboard(self):
 		if self.sel_start is None:
 			return
-		a, b = sorted((self.sel_start), self.cursor)
+		a, b = sorted((self.sel_start, self.cursor))
 		s = self.text[a:b]
-		if self._scrap:
+		clip = clipboard()
+		if clip:
 			try:
-				self._scrap.put(self._scrap.SCRAP_TEXT, s.encode("utf-8"))
+				clip.put(clip.SCRAP_TEXT, s.encode("utf-8"))
 			except Exception:
 				pass
 	
 	def _paste_from_clipboard(self):
-		if not self._scrap:
+		clip = clipboard()
+		if not clip:
 			return
 		try:
-			raw = self._scrap.get(self._scrap.SCRAP_TEXT)
+			raw = clip.get(clip.SCRAP_TEXT)
 			if not raw:
 				return
 		except Exception:
 			return
+		s = raw.decode("utf-8", "ignore").rstrip("\x00") if isinstance(raw, bytes) else str(raw)
 		if self._delete_selection():
 			pass
 		insert_at = self.cursor
 		if self.max_length is not None:
 			allowed = self.max_length - len(self.text)
 			s = s[:max(0, allowed)]
-		self.text = self.text[:insert_at] + s + self.text[insert_at:]
+		self._splice(insert_at, insert_at, s)
 		self.cursor = insert_at + len(s)
 		self._call_change()
 
@@ -382,7 +735,7 @@ class TextInput:
 					consumed = True
 				else:
 					if self.cursor > 0:
-						self.text = self.text[:self.cursor-1] + self.text[self.cursor:]
+						self._splice(self.cursor - 1, self.cursor, "")
 						self.cursor -= 1
 						self._call_change()
 						consumed = True
@@ -392,7 +745,7 @@ class TextInput:
 					consumed = True
 				else:
 					if self.cursor < len(self.text):
-						self.text = self.text[:self.cursor] + self.text[self.cursor+1:]
+						self._splice(self.cursor, self.cursor + 1, "")
 						self._call_change()
 						consumed = True
 
@@ -465,7 +818,7 @@ class TextInput:
 					if self.max_length is not None:
 						allowed = self.max_length - len(self.text)
 						ch = ch[:max(0, allowed)]
-					self.text = self.text[:insert_at] + ch + self.text[insert_at:]
+					self._splice(insert_at, insert_at, ch)
 					self.cursor = insert_at + len(ch)
 					self._call_change()
 					consumed = True
@@ -478,18 +831,13 @@ class TextInput:
 		return consumed
 	
 	def _position_cursor_from_x(self, x):
-		# approximate cursor position by measuring text widths
+		# the character boundary nearest the click (binary search over the cached prefix widths)
 		rel_x = x - (self.rect.x + 8)
-		pos = 0
-		acc = 0
-		for i in range(len(self.text) + 1):
-			seg = self.text[:i]
-			w = self.font().size(seg)[0]
-			if w >= rel_x:
-				pos = i
-				break
-			pos = i
-		self.cursor = pos
+		prefix = self._widths()
+		i = min(bisect.bisect_left(prefix, rel_x), len(self.text))
+		if i > 0 and rel_x - prefix[i - 1] < prefix[i] - rel_x:
+			i -= 1
+		self.cursor = i
 		self._clamp_cursor()
 
 	def draw(self, surf):
@@ -507,7 +855,11 @@ class TextInput:
 		inner_w = max(4, self.rect.w - 16)
 		text_to_draw = self.text if self.text else self.placeholder
 		colour = (40, 34, 30) if self.text else (140, 130, 120)
-		txt_surf = self.font().render(text_to_draw, True, colour)
+		font = self.font()
+		cache = self._text_cache
+		if cache is None or cache[0] != text_to_draw or cache[1] != colour or cache[2] is not font:
+			cache = self._text_cache = (text_to_draw, colour, font, font.render(text_to_draw, True, colour))
+		txt_surf = cache[3]
 
 		# clip and blit
 		prev_clip = surf.get_clip()
@@ -518,7 +870,7 @@ class TextInput:
 		if self.focus:
 			self._update_blink()
 			if self._show_caret:
-				caret_x = inner_x + self.font().size(self.text[:self.cursor])[0]
+				caret_x = inner_x + self._widths()[min(self.cursor, len(self.text))]
 				caret_rect = pygame.Rect(caret_x, self.rect.y + 6, 2, self.rect.h - 12)
 				pygame.draw.rect(surf, (40, 34, 30), caret_rect)
 		